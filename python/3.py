@@ -11,107 +11,24 @@ from __future__ import print_function
 import sys
 sys.path.insert(0, '..')
 
-import logging
 import serial
 import serial.threaded
-import threading
 
-try:
-    import queue
-except ImportError:
-    import Queue as queue
+from modem.at import ATEngine, final_response
+from modem.state import ModemState
+from modem.tcp import TCPLink
 
 
-class ATException(Exception):
-    pass
+class ATProtocol(ATEngine):
+    """\
+    AT protocol on top of the pipelined engine: commands do not wait for each
+    other on a lock, the reader dispatches responses to the queued commands.
+    Information responses and URCs are parsed by the URC registry.
+    """
 
-
-class ATProtocol(serial.threaded.LineReader):
-
-    TERMINATOR = b'\r\n'
-
-    def __init__(self):
-        super(ATProtocol, self).__init__()
-        self.alive = True
-        self.responses = queue.Queue()
-        self.events = queue.Queue()
-        self._event_thread = threading.Thread(target=self._run_event)
-        self._event_thread.daemon = True
-        self._event_thread.name = 'at-event'
-        self._event_thread.start()
-        self.lock = threading.Lock()
-
-    def stop(self):
-        """
-        Stop the event processing thread, abort pending commands, if any.
-        """
-        self.alive = False
-        self.events.put(None)
-        self.responses.put('<exit>')
-
-    def _run_event(self):
-        """
-        Process events in a separate thread so that input thread is not
-        blocked.
-        """
-        while self.alive:
-            try:
-                self.handle_event(self.events.get())
-            except:
-                logging.exception('_run_event')
-
-    def handle_line(self, line):
-        """
-        Handle input from serial port, check for events.
-        """
-        self.events.put(line)
-
-    def handle_event(self, event):
-        """
-        Spontaneous message received.
-        """
-        print('event received:', event)
-
-    def command(self, command, response='OK', timeout=5):
-        """
-        Set an AT command and wait for the response.
-        """
-        with self.lock:  # ensure that just one thread is sending commands at once
-            self.write_line(command + '\r')
-            lines = []
-            while True:
-                try:
-                    line = self.responses.get(timeout=timeout)
-                    print("%s -> %r" % (command, line))
-                    if line == response:
-                        return lines
-                    else:
-                        lines.append(line)
-                except queue.Empty:
-                    raise ATException('AT command timeout ({!r})'.format(command))
-
-    def command_wait_response(self, command, r1=None, r2=None, r3=None, timeout=1):
-        with self.lock:
-            self.transport.write(b'%b\r' % (command.encode(self.ENCODING, self.UNICODE_HANDLING)))
-            while True:
-                try:
-                    line = self.responses.get(timeout=timeout)
-
-                    if r1 is not None and line == r1:
-                        return 1, line
-                    elif r2 is not None and line == r2:
-                        return 2, line
-                    elif r3 is not None  and line == r3:
-                        return 3, line
-
-                except queue.Empty:
-                    raise ATException('AT command timeout ({!r})'.format(command))
-
-
-def parse_ok_error(line):
-    if line == 'OK': return 'ok'
-    elif line == 'ERROR': return 'fail'
-    else: return 'unkonwn'
+    def handle_urc(self, line):
+        if not self.urc.dispatch(line):
+            print('event received:', line)
 
 
 # test
@@ -122,134 +39,52 @@ if __name__ == '__main__':
         """
         Example communication with PAN1322 BT module.
 
-        Some commands do not respond with OK but with a '+...' line. This is
-        implemented via command_with_event_response and handle_event, because
-        '+...' lines are also used for real events.
+        Some commands do not respond with OK but with a '+...' line, these
+        wait for the line with final_response().
         """
 
-        def __init__(self):
-            super(PAN1322, self).__init__()
-            self.event_responses = queue.Queue()
-            self._awaiting_response_for = None
-            self._response_parser = None
-
         def connection_made(self, transport):
             super(PAN1322, self).connection_made(transport)
             # our adapter enables the module with RTS=low
             self.transport.serial.rts = False
             time.sleep(0.3)
             self.transport.serial.reset_input_buffer()
+            self.state = ModemState(self)
+            self.tcp = TCPLink(self, 1)
+            self.urc.subscribe('+TCPRECV', self.handle_tcp_recv)
+            self.urc.subscribe('+TCPCLOSE', self.handle_tcp_close)
+
+        def handle_tcp_recv(self, token, recv):
+            print('received on link {}: {!r}'.format(recv.link, recv.data))
 
-        def handle_event(self, event):
-            """Handle events and command responses starting with '+...'"""
-            retval = self._response_parser(event)
-            if retval == 'ok' or retval == 'fail':
-                self.event_responses.put(mac)
-
-            if event.startswith('+CGMR') and self._awaiting_response_for.startswith('AT+CGMR'):
-                rev = event[7:]
-                self.event_responses.put(rev)
-            elif event.startswith('+CCID') and self._awaiting_response_for.startswith('AT+CCID'):
-                rev = event[7:]
-                self.event_responses.put(rev)
-            elif event.startswith('+CPIN') and self._awaiting_response_for.startswith('AT+CPIN?'):
-                rev = event[7:]
-                self.event_responses.put(rev)
-            elif event.startswith('+CSQ') and self._awaiting_response_for.startswith('AT+CSQ'):
-                rev = event[6:]
-                csq = rev.split(',', 1)
-                self.event_responses.put(csq[0])
-            elif event.startswith('+CREG') and self._awaiting_response_for.startswith('AT+CREG?'):
-                rev = event[7:]
-                reg = rev.split(',', 1)
-                self.event_responses.put(reg[1])
-
-            elif event.startswith('+CGATT') and self._awaiting_response_for.startswith('AT+CGATT?'):
-                rev = event[8:]
-                self.event_responses.put(rev)
-
-            elif event.startswith('+XIIC') and self._awaiting_response_for.startswith('AT+XIIC?'):
-                rev = event[7:]
-                ip = rev.split(',', 1)[1]
-                self.event_responses.put(ip)
-
-            elif event.startswith('+TCPCLOSE') and self._awaiting_response_for.startswith('AT+TCPCLOSE'):
-                ok = event[11:]
-                self.event_responses.put(ok)
-
-            elif event.startswith('+TCPSETUP') and self._awaiting_response_for.startswith('AT+TCPSETUP'):
-                ok = event.split(',', 1)[1]
-                self.event_responses.put(ok)
-
-            elif event.startswith('+TCPACK') and self._awaiting_response_for.startswith('AT+TCPACK'):
-                ok = event.split(',', 1)[1]
-                self.event_responses.put(ok)
-
-            else:
-                logging.warning('unhandled event: {!r}'.format(event))
-
-        def command_with_event_response(self, command, timeout=1):
-            """Send a command that responds with '+...' line"""
-            with self.lock:  # ensure that just one thread is sending commands at once
-                self._awaiting_response_for = command
-                self.transport.write(b'%b\r' % (command.encode(self.ENCODING, self.UNICODE_HANDLING)))
-                response = self.event_responses.get(timeout=timeout)
-                self._awaiting_response_for = None
-                return response
-
-        def commandAT(self, command, parser, timeout=1):
-            """Send a command that responds with '+...' line"""
-            with self.lock:  # ensure that just one thread is sending commands at once
-                self._awaiting_response_for = command
-                self._response_parser = parser
-                self.transport.write(b'%b\r' % (command.encode(self.ENCODING, self.UNICODE_HANDLING)))
-                response = self.event_responses.get(timeout=timeout)
-                self._awaiting_response_for = None
-                return response
+        def handle_tcp_close(self, token, close):
+            print('link {} closed: {}'.format(close.link, close.result))
 
         # - - - example commands
 
         def reset(self):
-            r, line = self.command_wait_response("AT", r1='OK')      # SW-Reset BT module
-            return r == 1, line
+            return self.command('AT')      # SW-Reset BT module
 
         def disable_echo(self):
-            r, line = self.command_wait_response("ATE0", r1='OK')
-            return r == 1, line
+            return self.command('ATE0')
 
         def get_version(self):
-            r, line = self.command_wait_response("AT+CGMR", r1='+CGMR')
-            if r == 1:
-                return True, line[7:]
-            else:
+            return self.query('AT+CGMR')
 
         def get_ccid(self):
-            r, line = self.command_wait_response("AT+CCID", r1='+CCID')
-            if r == 1:
-                return True, line[7:]
-            else:
-                return False, line
+            return self.query('AT+CCID')
 
         def get_cpin(self):
-            r, line = self.command_wait_response("AT+CPIN?", r1='+CPIN')
-            if r == 1:
-                return True, line[7:]
-            else:
-                return False, line
+            return self.query('AT+CPIN?')
 
         def get_signal_quality(self):
-            r, line = self.command_wait_response("AT+CSQ", r1='+CSQ')
-            if r == 1:
-                csq = line[6:].split(',', 1)
-                return True, int(csq[0])
-            else:
-                return False, line
+            return self.query('AT+CSQ').rssi
 
         def get_registration(self):
-            r, line = self.command_wait_response("AT+CREG?")
+            return self.query('AT+CREG?').stat
 
         def get_network_attached(self):
-            return self.command_with_event_response("AT+CGATT?")
+            return self.query('AT+CGATT?')
 
         def set_apn(self):
             return self.command('AT+NETAPN="CMNET","",""')
@@ -258,21 +93,21 @@ if __name__ == '__main__':
             return self.command('AT+XIIC=1')
 
         def get_ppp(self):
-            return self.command_with_event_response("AT+XIIC?", timeout=5)
+            return self.query('AT+XIIC?', timeout=5).ip
 
         def tcp_close(self):
-            return self.command_with_event_response('AT+TCPCLOSE=1')
+            return self.query('AT+TCPCLOSE=1', final=final_response('+TCPCLOSE')).result
 
         def tcp_setup(self):
-            return self.command_with_event_response('AT+TCPSETUP=1,59.110.215.205,9900', timeout=30)
+            return self.query('AT+TCPSETUP=1,59.110.215.205,9900', final=final_response('+TCPSETUP'), timeout=30).result
 
         def tcp_check(self):
-            return self.command_with_event_response('AT+TCPACK=1')
-
-        def tcp_send(self, data):
-            length = len(data)
-            return self.command_with_event_response('AT+TCPACK=1,'+len)
+            return self.query('AT+TCPACK=1').result
 
+        def tcp_send(self, data, timeout=30):
+            """Send data over link 1 in data mode, wait until it is acknowledged"""
+            self.tcp.send(data, timeout)
+            self.tcp.flush(timeout)
 
 
     ser = serial.serial_for_url('/dev/cu.usbserial', baudrate=57600, timeout=1)
@@ -287,33 +122,21 @@ if __name__ == '__main__':
         print(bt_module.get_version())
         print(bt_module.get_ccid())
 
-        while True:
-            cpin = bt_module.get_cpin()
-            print('CPIN?', cpin)
-            if cpin == 'READY':
-                break
-            time.sleep(1)
+        # SIM and registration state follow the URCs, the waits return as
+        # soon as the modem reports the change
+        bt_module.state.start()
+        print('SIM ready', bt_module.state.wait_for('sim_ready', timeout=30))
 
         for i in range(10):
-            quality = int(bt_module.get_signal_quality())
+            quality = bt_module.get_signal_quality()
             print('signal quality', quality)
             if quality > 12 and quality != 99:
                 break
             time.sleep(1)
 
-        for i in range(10):
-            registration = bt_module.get_registration()
-            print('CREG', registration)
-            if registration == '1' or registration == '5':
-                break
-            time.sleep(1)
-
-        for i in range(20):
-            attach = bt_module.get_network_attached()
-            print('Attached', attach)
-            if attach == '1':
-                break
-            time.sleep(1)
+        print('CREG', bt_module.state.wait_for('registered', timeout=60))
+        print('CGREG', bt_module.state.wait_for('gprs_registered', timeout=60))
+        print('Attached', bt_module.get_network_attached())
 
         print(bt_module.set_apn())
         print(bt_module.enable_ppp())
@@ -337,6 +160,8 @@ if __name__ == '__main__':
                 break
             time.sleep(1)
 
+        bt_module.tcp_send(b'hello\r\n' * 1000)
+
         for i in range(10):
             print(bt_module.tcp_check())
             time.sleep(1)
@@ -11,88 +11,28 @@ from __future__ import print_function
 import sys
 sys.path.insert(0, '..')
 
-import logging
 import serial
 import serial.threaded
-import threading
 
 try:
     import queue
 except ImportError:
     import Queue as queue
 
+from modem.at import ATEngine, ATCommandError, final_response
+from modem.tcp import TCPLink
 
-class ATException(Exception):
-    pass
 
+class ATProtocol(ATEngine):
+    """\
+    AT protocol on top of the pipelined engine: commands do not wait for each
+    other on a lock, the reader dispatches responses to the queued commands.
+    Information responses and URCs are parsed by the URC registry.
+    """
 
-class ATProtocol(serial.threaded.LineReader):
-
-    TERMINATOR = b'\r\n'
-
-    def __init__(self):
-        super(ATProtocol, self).__init__()
-        self.alive = True
-        self.responses = queue.Queue()
-        self.events = queue.Queue()
-        self._event_thread = threading.Thread(target=self._run_event)
-        self._event_thread.daemon = True
-        self._event_thread.name = 'at-event'
-        self._event_thread.start()
-        self.lock = threading.Lock()
-
-    def stop(self):
-        """
-        Stop the event processing thread, abort pending commands, if any.
-        """
-        self.alive = False
-        self.events.put(None)
-        self.responses.put('<exit>')
-
-    def _run_event(self):
-        """
-        Process events in a separate thread so that input thread is not
-        blocked.
-        """
-        while self.alive:
-            try:
-                self.handle_event(self.events.get())
-            except:
-                logging.exception('_run_event')
-
-    def handle_line(self, line):
-        """
-        Handle input from serial port, check for events.
-        """
-        print('response: <%r>' % line)
-        self.responses.put(line)
-
-    def handle_event(self, event):
-        """
-        Spontaneous message received.
-        """
-        print('event received:', event)
-
-    def command(self, command):
-        """
-        Set an AT command and wait for the response.
-        """
-        print("command: <%r>" %command)
-        with self.lock:  # ensure that just one thread is sending commands at once
-            self.transport.write(command.encode(self.ENCODING, self.UNICODE_HANDLING) + b'\r')
-
-    def wait_response(self, r1='OK', r2='ERROR', timeout=1):
-        with self.lock:
-            while True:
-                try:
-                    line = self.responses.get(timeout=timeout)
-                    if line.startswith(r1):
-                            return 1, line
-                    elif line == r2:
-                        return r2, line
-
-                except queue.Empty:
-                    raise ATException('AT command timeout ({%r})' % r1)
+    def handle_urc(self, line):
+        if not self.urc.dispatch(line):
+            print('event received:', line)
 
 
 # test
@@ -103,120 +43,82 @@ if __name__ == '__main__':
         """
         Example communication with PAN1322 BT module.
 
-        Some commands do not respond with OK but with a '+...' line. This is
-        implemented via command_with_event_response and handle_event, because
-        '+...' lines are also used for real events.
+        Some commands do not respond with OK but with a '+...' line, these
+        wait for the line with final_response().
         """
 
-        def __init__(self):
-            super(PAN1322, self).__init__()
-
         def connection_made(self, transport):
             super(PAN1322, self).connection_made(transport)
             # our adapter enables the module with RTS=low
             self.transport.serial.rts = False
             time.sleep(0.3)
             self.transport.serial.reset_input_buffer()
+            self.tcp = TCPLink(self, 1)
+            self.received = queue.Queue()
+            self.urc.subscribe('+TCPRECV', lambda token, recv: self.received.put(recv))
 
         def reset(self):
-            self.command('AT')
-            return self.wait_response()
+            return self.command('AT')
 
         def disable_echo(self):
-            self.command('ATE0')
-            return self.wait_response()
+            return self.command('ATE0')
 
         def get_version(self):
-            self.command("AT+CGMR")
-            r, line = self.wait_response('+CGMR')
-            if r == 1:
-                return r, line[7:]
-            else:
-                return None, line
+            return self.query('AT+CGMR')
 
         def get_ccid(self):
-            self.command("AT+CCID")
-            r, line = self.wait_response('+CCID')
-            if r == 1:
-                return r, line[7:]
-            else:
-                return None, line
+            try:
+                return 1, self.query('AT+CCID')
+            except ATCommandError as e:
+                return None, e.result
 
         def get_cpin(self):
-            self.command("AT+CPIN?")
-            r, line = self.wait_response('+CPIN')
-            if r == 1:
-                return r, line[7:]
-            else:
-                return None, line
+            try:
+                return 1, self.query('AT+CPIN?')
+            except ATCommandError as e:
+                return None, e.result
 
         def get_signal_quality(self):
-            self.command("AT+CSQ")
-            r, line = self.wait_response('+CSQ')
-            print('get_signal_quality:', line)
-            line = line[6:]
-            csq = line.split(',', 1)
-            return int(csq[0])
+            csq = self.query('AT+CSQ')
+            print('get_signal_quality:', csq)
+            return csq.rssi
 
         def get_registration(self):
-            self.command("AT+CREG?")
-            r, line = self.wait_response('+CREG')
-            line = line[7:]
-            reg = line.split(',', 1)
-            return reg[1]
+            return self.query('AT+CREG?').stat
 
         def get_network_attached(self):
-            self.command("AT+CGATT?")
-            r, line = self.wait_response('+CGATT')
-            attached = line[8:]
-            return attached
+            return self.query('AT+CGATT?')
 
         def set_apn(self):
-            self.command('AT+NETAPN="CMNET","",""')
-            return self.wait_response()
+            return self.command('AT+NETAPN="CMNET","",""')
 
         def enable_ppp(self):
-            self.command('AT+XIIC=1')
-            return self.wait_response()
+            return self.command('AT+XIIC=1')
 
         def get_ip(self):
-            self.command("AT+XIIC?")
-            r, line = self.wait_response('+XIIC', timeout=5)
-            line = line.split(',', 1)
-            ip = line[1]
-            return ip
+            return self.query('AT+XIIC?', timeout=5).ip
 
         def tcp_close(self):
-            self.command('AT+TCPCLOSE=1')
-            return self.wait_response('+TCPCLOSE')
+            return self.query('AT+TCPCLOSE=1', final=final_response('+TCPCLOSE')).result
 
         def tcp_setup(self):
-            self.command('AT+TCPSETUP=1,59.110.215.205,9900')
-            r, line = self.wait_response('+TCPSETUP', timeout=30)
-            line = line[11:].split(',', 1)
-            return line[1]
+            return self.query('AT+TCPSETUP=1,59.110.215.205,9900', final=final_response('+TCPSETUP'), timeout=30).result
 
         def tcp_is_connected(self):
-            self.command('AT+IPSTATUS=1')
-            r, line = self.wait_response('+IPSTATUS')
-            line = line.split(',', 3)
-            status = line[1]
-            return status == 'CONNECT'
+            # no parser for +IPSTATUS, the text is '<link>,<status>,...'
+            status = self.query('AT+IPSTATUS=1').split(',', 2)
+            return status[1] == 'CONNECT'
 
-        def tcp_send(self, data):
-            self.command('AT+TCPSEND=1,' + str(len(data)))
+        def tcp_send(self, data, timeout=30):
+            """Send data over link 1 in data mode, wait until it is acknowledged"""
+            self.tcp.send(data.encode(self.ENCODING, self.UNICODE_HANDLING), timeout)
+            self.tcp.flush(timeout)
 
-            #self.wait_response('>', timeout=10)
-            time.sleep(0.5)
-            self.transport.write(data.encode(self.ENCODING, self.UNICODE_HANDLING))
-
-            self.wait_response(timeout=5)
-            r, line = self.wait_response('+TCPSEND', timeout=5)
-            return r, line
-
-        def tcp_recv(self):
-            r, line = self.wait_response('+TCPRECV', timeout=10)
-            return r, line
+        def tcp_recv(self, timeout=10):
+            try:
+                return self.received.get(timeout=timeout)
+            except queue.Empty:
+                return None
 
 
     ser = serial.serial_for_url('/dev/cu.usbserial', baudrate=57600, timeout=1)
@@ -251,7 +153,7 @@ if __name__ == '__main__':
 
             for i in range(10):
                 reg = modem.get_registration()
-                if reg == '1' or reg == '5':
+                if reg == 1 or reg == 5:
                     break
                 time.sleep(1)
             else:
@@ -259,7 +161,7 @@ if __name__ == '__main__':
 
             for i in range(10):
                 attached = modem.get_network_attached()
-                if attached == '1':
+                if attached == 1:
                     break
                 time.sleep(1)
             else:
@@ -1,53 +1,351 @@
 #!/usr/bin/env python3
+#
+# Collector for the modems' TCP links (AT+TCPSETUP)
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+TCP collector server. By default every line received is answered with
+'<time.time()>: <line>'.
 
-import socket
+Each connection is driven by a Protocol instance as used by the
+serial.threaded.ReaderThread (Packetizer, LineReader, FramedPacket, ...), so
+the framing code of the serial side can be reused here. The connection is
+the transport of the protocol: it provides write() and close() and the
+attributes socket and address.
+
+One epoll object per process serves all connections, edge triggered: input
+is read until EAGAIN and passed to the protocol, output that the socket does
+not take at once is kept in an output buffer that is flushed on EPOLLOUT.
+New connections are accepted in batches.
+
+Backpressure: when the output buffer of a connection exceeds the high water
+mark (e.g. a client that does not read its answers), reading from it stops
+until the buffer is flushed below the low water mark; protocols that
+implement pause_writing() and resume_writing() are notified. A client that
+sends more than max_input bytes without completing a packet is disconnected.
+
+With --workers N, N processes each bind their own listening socket with
+SO_REUSEPORT and the kernel distributes the connections among them.
+"""
+import errno
+import importlib
+import logging
+import os
 import select
+import signal
+import socket
 import time
 
-EOL1 = b'\n'
+import serial.threaded
+
+
+class TimestampLines(serial.threaded.Packetizer):
+    """\
+    Answer each line with '<time.time()>: <line>', without decoding it. The
+    lines are logged with level DEBUG.
+    """
+
+    TERMINATOR = b'\n'
+
+    def connection_made(self, transport):
+        super(TimestampLines, self).connection_made(transport)
+        logger = transport.server.logger
+        self.debug = logger.isEnabledFor(logging.DEBUG) and logger.debug
+
+    def handle_packet(self, packet):
+        if self.debug:
+            self.debug('line {} {!r}'.format(self.transport.address, bytes(packet)))
+        self.transport.write(b'%.6f: ' % time.time() + packet + self.TERMINATOR)
+
+
+class Connection(object):
+    """\
+    State of one client connection and the transport of its protocol. Not
+    thread safe, write() and close() must be called from the server loop
+    (i.e. from the protocol callbacks).
+    """
+
+    def __init__(self, server, sock, address, protocol):
+        self.server = server
+        self.socket = sock
+        self.address = address
+        self.protocol = protocol
+        self.output = bytearray()
+        self.paused = False     # reading stopped, output above high water mark
+        self.closing = False    # close when the output is flushed
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def write(self, data):
+        """Queue data, it is sent when the protocol callback returns"""
+        self.output.extend(data)
+
+    def close(self):
+        """Close the connection after sending the queued output"""
+        self.closing = True
+
+
+def _buffered(protocol):
+    """Bytes held by a serial.threaded protocol while waiting for the end of a packet"""
+    return len(getattr(protocol, 'buffer', b'')) + len(getattr(protocol, 'packet', b''))
+
+
+class CollectorServer(object):
+    """\
+    Serve any number of connections with one edge triggered epoll object.
+    protocol_factory is called for each connection (see serial.threaded).
+    """
+
+    READ_SIZE = 65536
+
+    def __init__(self, address=('0.0.0.0', 9900), protocol_factory=TimestampLines, backlog=socket.SOMAXCONN,
+                 reuse_port=False, accept_batch=64, high_water=256 * 1024, low_water=64 * 1024,
+                 max_input=64 * 1024, logger=None):
+        self.logger = logger or logging.getLogger('echosock')
+        self.protocol_factory = protocol_factory
+        self.accept_batch = accept_batch
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_input = max_input
+        self.connections = {}   # fd -> Connection
+        self.alive = False
+        self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.listen_socket.bind(address)
+        self.listen_socket.listen(backlog)
+        self.listen_socket.setblocking(False)
+        self.epoll = select.epoll()
+        # level triggered: connections left in the backlog after a batch are
+        # reported again by the next poll
+        self.epoll.register(self.listen_socket.fileno(), select.EPOLLIN)
+
+    def _accept(self):
+        """Accept up to accept_batch pending connections"""
+        for _ in range(self.accept_batch):
+            try:
+                sock, address = self.listen_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # e.g. EMFILE, ECONNABORTED: keep serving the others
+                self.logger.warning('accept failed: {}'.format(e))
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = Connection(self, sock, address, self.protocol_factory())
+            self.connections[sock.fileno()] = connection
+            # registered once for input and output, edge triggered
+            self.epoll.register(
+                sock.fileno(), select.EPOLLIN | select.EPOLLOUT | select.EPOLLRDHUP | select.EPOLLET)
+            self.logger.info('connect {} {}'.format(sock.fileno(), address))
+            try:
+                connection.protocol.connection_made(connection)
+            except Exception as e:
+                self._disconnect(connection, e)
+                continue
+            self._flush(connection)
+
+    def _disconnect(self, connection, error=None):
+        fd = connection.fileno()
+        if self.connections.pop(fd, None) is None:
+            return
+        self.logger.info('close connect {} {}'.format(fd, error or ''))
+        self.epoll.unregister(fd)
+        connection.socket.close()
+        # exceptions must not end the loop that serves all the other clients
+        try:
+            connection.protocol.connection_lost(error)
+        except Exception as e:
+            if e is not error:
+                self.logger.exception('connection_lost of {}'.format(connection.address))
+
+    def _read(self, connection):
+        """\
+        Read until EAGAIN or until the output exceeds the high water mark.
+        Returns False if the connection is closed.
+        """
+        while True:
+            while not connection.paused:
+                try:
+                    data = connection.socket.recv(self.READ_SIZE)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as e:
+                    self._disconnect(connection, e)
+                    return False
+                if not data:
+                    self._disconnect(connection)
+                    return False
+                try:
+                    connection.protocol.data_received(data)
+                except Exception as e:
+                    self._disconnect(connection, e)
+                    return False
+                if _buffered(connection.protocol) > self.max_input:
+                    self._disconnect(connection, ValueError('more than {} bytes without end of packet'.format(
+                        self.max_input)))
+                    return False
+                if len(connection.output) > self.high_water:
+                    # try to get rid of it before deciding to stop reading
+                    if not self._flush(connection):
+                        return False
+                if len(data) < self.READ_SIZE:
+                    break   # drained, saves the recv that would return EAGAIN
+            paused = connection.paused
+            if not self._flush(connection):
+                return False
+            if not paused or connection.paused:
+                return True
+            # resumed: input that arrived while paused did not trigger a new
+            # edge, read it now (in this loop, not recursively)
+
+    def _write_ready(self, connection):
+        """EPOLLOUT: flush the output, read again if that resumes reading"""
+        paused = connection.paused
+        if not self._flush(connection):
+            return False
+        if paused and not connection.paused:
+            # input that arrived while paused did not trigger a new edge
+            return self._read(connection)
+        return True
+
+    def _flush(self, connection):
+        """\
+        Send as much output as possible, pause or resume reading depending on
+        the amount left. Returns False if the connection is closed.
+        """
+        output = connection.output
+        while output:
+            try:
+                n = connection.socket.send(output)
+            except (BlockingIOError, InterruptedError):
+                break   # the rest is sent on EPOLLOUT
+            except OSError as e:
+                self._disconnect(connection, e)
+                return False
+            del output[:n]
+        if not connection.paused and len(output) > self.high_water:
+            connection.paused = True
+            self.logger.debug('pause reading {}'.format(connection.address))
+            if hasattr(connection.protocol, 'pause_writing'):
+                connection.protocol.pause_writing()
+        elif connection.paused and len(output) <= self.low_water:
+            connection.paused = False
+            self.logger.debug('resume reading {}'.format(connection.address))
+            if hasattr(connection.protocol, 'resume_writing'):
+                connection.protocol.resume_writing()
+        if connection.closing and not output:
+            self._disconnect(connection)
+            return False
+        return True
+
+    def run(self):
+        """Serve until stop() is called"""
+        self.alive = True
+        listen_fd = self.listen_socket.fileno()
+        while self.alive:
+            try:
+                events = self.epoll.poll(1)
+            except InterruptedError:
+                continue
+            for fd, event in events:
+                if fd == listen_fd:
+                    self._accept()
+                    continue
+                connection = self.connections.get(fd)
+                if connection is None:
+                    continue    # closed while handling an earlier event
+                if event & select.EPOLLIN and not connection.paused:
+                    if not self._read(connection):
+                        continue
+                if event & select.EPOLLOUT:
+                    if not self._write_ready(connection):
+                        continue
+                if event & (select.EPOLLHUP | select.EPOLLERR):
+                    self._disconnect(connection)
+                elif event & select.EPOLLRDHUP and not connection.output and not connection.paused:
+                    # peer closed its side and all answers are sent
+                    self._disconnect(connection)
+
+    def stop(self):
+        self.alive = False
+
+    def close(self):
+        for connection in list(self.connections.values()):
+            self._disconnect(connection)
+        self.epoll.unregister(self.listen_socket.fileno())
+        self.epoll.close()
+        self.listen_socket.close()
+
 
-serversocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-serversocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-serversocket.bind(('0.0.0.0', 9900))
-serversocket.listen(1)
-serversocket.setblocking(0)
+def load_protocol(spec):
+    """Return the class for 'module:Class'"""
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)
 
-print('listen on 0.0.0.0:', 9900)
 
-epoll = select.epoll()
-epoll.register(serversocket.fileno(), select.EPOLLIN)
+def serve(address, protocol_factory, backlog, reuse_port):
+    server = CollectorServer(address, protocol_factory, backlog, reuse_port)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
 
-try:
-    connections = {}
-    request = b''
 
-    while True:
-        events = epoll.poll(1)
+def main():
+    import argparse
 
-        for fileno, event in events:
+    parser = argparse.ArgumentParser(description='TCP collector, answers each line with a time stamp.')
+    parser.add_argument('--host', default='0.0.0.0', help='local address (default: %(default)s)')
+    parser.add_argument('-p', '--port', type=int, default=9900, help='local port (default: %(default)s)')
+    parser.add_argument('--protocol', type=load_protocol, default=TimestampLines,
+                        help='protocol class per connection as module:Class, e.g. '
+                             'serial.threaded subclasses (default: answer lines with a time stamp)')
+    parser.add_argument('--backlog', type=int, default=socket.SOMAXCONN,
+                        help='listen backlog (default: %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of processes sharing the port with SO_REUSEPORT (default: %(default)s)')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='print connections, -vv lines too')
+    args = parser.parse_args()
 
-            if fileno == serversocket.fileno():
-                conn, address = serversocket.accept()
-                print("connect ", conn.fileno(), address)
-                conn.setblocking(0)
-                epoll.register(conn.fileno(), select.EPOLLIN)
-                connections[conn.fileno()] = conn
+    logging.basicConfig(level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)],
+                        format='%(process)d %(message)s')
+    address = (args.host, args.port)
+    print('listen on {}:{}'.format(*address))
 
-            elif event & select.EPOLLIN:
-                request = connections[fileno].recv(1024)
-                if EOL1 in request:
-                    print('-> ' + request.decode())
-                    s = str(time.time()) + ': ' + request.decode()
-                    connections[fileno].send(s.encode('utf-8'))
+    if args.workers <= 1:
+        serve(address, args.protocol, args.backlog, False)
+        return
 
-                if len(request) == 0:
-                    print('close connect', fileno)
-                    epoll.unregister(fileno)
-                    connections[fileno].close()
-                    del connections[fileno]
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)   # the parent stops the workers
+            try:
+                serve(address, args.protocol, args.backlog, True)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError as e:
+                if e.errno != errno.ESRCH:
+                    raise
+        for pid in children:
+            os.waitpid(pid, 0)
 
-finally:
-    epoll.unregister(serversocket.fileno())
-    epoll.close()
-    serversocket.close()
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+#
+# Support for AT command driven modems on top of pySerial
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Drive AT command modems (https://en.wikipedia.org/wiki/Hayes_command_set,
+http://www.itu.int/rec/T-REC-V.250-200307-I/en) with the protocols of
+serial.threaded.
+"""
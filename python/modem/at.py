@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+#
+# Pipelined AT command engine
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+AT command engine. It is a serial.threaded protocol, so it can be driven by
+a ReaderThread, the EpollReactor (serial.reactor) or an asyncio
+SerialTransport (serial.aio).
+
+Commands are queued and sent without holding a lock for the round trip. Each
+command is a future that is resolved by the reader when the final result
+code arrives. Up to max_in_flight commands are written before the previous
+final result is received. Responses are assigned in order. Lines starting
+with '+XXX:' that do not belong to the command currently answered are
+unsolicited result codes (URCs) and go to handle_urc(), which dispatches
+them through the URCRegistry in the attribute urc.
+"""
+import collections
+import concurrent.futures
+import logging
+import re
+import threading
+
+import serial.threaded
+from serial.serialutil import Timeout
+
+from modem.urc import URCRegistry
+
+
+class ATException(Exception):
+    """Base class for AT command related exceptions"""
+
+
+class ATCommandError(ATException):
+    """The modem answered with an error final result code"""
+
+    def __init__(self, command, result, lines):
+        super(ATCommandError, self).__init__('{!r} failed: {}'.format(command, result))
+        self.command = command
+        self.result = result
+        self.lines = lines
+
+
+class ATTimeout(ATException):
+    """No final result code was received in time"""
+
+
+# V.250 final result codes, CONNECT is the final result of a dial command
+FINAL_OK = ('OK', 'CONNECT')
+FINAL_ERROR = ('ERROR', '+CME ERROR', '+CMS ERROR', 'NO CARRIER', 'BUSY',
+               'NO ANSWER', 'NO DIALTONE')
+
+
+def final_result(line):
+    """\
+    Default final result matcher: returns True for success, False for errors
+    and None for all other (intermediate and information) lines.
+    """
+    if line.startswith(FINAL_OK):
+        return True
+    if line.startswith(FINAL_ERROR):
+        return False
+    return None
+
+
+def final_response(prefix):
+    """\
+    Return a final result matcher for commands that complete with an
+    information response after the OK, e.g. 'AT+TCPSETUP=...' is done with
+    '+TCPSETUP: 1,OK'. Error result codes are detected as usual.
+    """
+    def match(line):
+        if line.startswith(prefix):
+            return True
+        if line.startswith(FINAL_ERROR):
+            return False
+        return None
+    return match
+
+
+# the information response prefix of extended commands, e.g. 'AT+CSQ' -> '+CSQ'
+_PREFIX = re.compile(r'^AT([+^$%#*][A-Z0-9_]+)', re.IGNORECASE)
+
+
+def response_prefix(command):
+    """\
+    Return the prefix of the information response lines of an extended
+    command ('AT+CREG?' -> '+CREG') or None for basic commands.
+    """
+    m = _PREFIX.match(command)
+    return m.group(1).upper() if m else None
+
+
+def urc_token(line):
+    """Return the '+XXX' token of a '+XXX: ...' line, or None"""
+    if line.startswith('+'):
+        end = line.find(':')
+        if end > 0:
+            return line[:end]
+    return None
+
+
+class ATCommand(concurrent.futures.Future):
+    """\
+    A queued AT command. It is a future, the result is the list of
+    information response lines (without the final result code).
+
+    prefix is the information response prefix ('+CSQ', or a tuple of
+    prefixes), derived from the command if not given. final is a callable
+    that gets each line and returns True (done), False (failed) or None
+    (more to come), e.g. for commands that complete with a '+...' line
+    instead of OK.
+    """
+
+    def __init__(self, command, prefix=None, final=None, timeout=5):
+        super(ATCommand, self).__init__()
+        self.command = command
+        self.prefix = prefix if prefix is not None else response_prefix(command)
+        self.final = final if final is not None else final_result
+        self.timeout = timeout
+        self.lines = []
+        self.deadline = None    # set when the command is sent (or queued unconnected)
+        self.echoed = False
+
+    def time_left(self):
+        """Time left until the command times out, the full timeout if not sent"""
+        if self.deadline is None:
+            return self.timeout
+        return self.deadline.time_left()
+
+    def owns(self, line):
+        """Return True if line is an information response of this command"""
+        token = urc_token(line)
+        return token is None or (self.prefix is not None and token.startswith(self.prefix))
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(self.__class__.__name__, self.command)
+
+
+class ATDataCommand(ATCommand):
+    """\
+    A command that is answered with a prompt (e.g. '> ', without line end)
+    after which the payload is sent, like 'AT+TCPSEND=<link>,<length>'. The
+    payload is written in chunks of mtu bytes. The final result code is
+    evaluated as usual after the payload.
+    """
+
+    def __init__(self, command, payload, prefix=None, final=None, timeout=5, prompt=b'>', mtu=256):
+        super(ATDataCommand, self).__init__(command, prefix, final, timeout)
+        self.payload = payload
+        self.prompt = prompt
+        self.mtu = mtu
+
+
+class ATEngine(serial.threaded.LineReader):
+    """\
+    Read lines from the modem and dispatch them to the queued commands or, if
+    unsolicited, to handle_urc().
+
+    max_in_flight limits the number of commands written before the final
+    result code of the first one is received, by default the next commands
+    are streamed while the first one is executed. Modems that drop
+    characters arriving during the execution of a command need
+    max_in_flight=1, commands are then sent by the reader as soon as the
+    previous one completes, without a round trip through the calling thread.
+
+    Data commands (ATDataCommand) are sent alone: nothing else is written
+    until the prompt is received and the payload is sent. If the modem echoes
+    the command, the echo of the payload is skipped in raw mode instead of
+    being split into lines.
+    """
+
+    TERMINATOR = b'\r\n'
+    COMMAND_TERMINATOR = b'\r'
+
+    def __init__(self, max_in_flight=4):
+        super(ATEngine, self).__init__()
+        self.max_in_flight = max_in_flight
+        self.logger = logging.getLogger('modem.at')
+        self._lock = threading.RLock()
+        self._queue = collections.deque()       # not yet sent
+        self._in_flight = collections.deque()   # sent, waiting for final result
+        self._prompt_for = None                 # data command waiting for the prompt
+        self._raw_remaining = 0                 # payload echo bytes to skip
+        self._lost = None                       # reason, once the connection is lost
+        self.urc = URCRegistry()
+
+    def connection_made(self, transport):
+        """Send the commands that were queued before the port was connected"""
+        super(ATEngine, self).connection_made(transport)
+        with self._lock:
+            self._lost = None
+            self._send_queued()
+
+    def connection_lost(self, exc):
+        """Fail all commands that are still pending, and the ones submitted later"""
+        with self._lock:
+            self._lost = 'connection lost ({!r})'.format(exc)
+            pending = list(self._in_flight) + list(self._queue)
+            self._in_flight.clear()
+            self._queue.clear()
+            self._prompt_for = None
+        for command in pending:
+            command.set_exception(ATException(self._lost))
+        super(ATEngine, self).connection_lost(exc)
+
+    # - - sending
+
+    def submit(self, command, prefix=None, final=None, timeout=5):
+        """\
+        Queue a command (text without terminator) and return its ATCommand
+        future. The command is sent as soon as possible.
+        """
+        if not isinstance(command, ATCommand):
+            command = ATCommand(command, prefix, final, timeout)
+        with self._lock:
+            lost = self._lost
+            if lost is None:
+                if self.transport is None:
+                    # not connected yet: the timeout runs from now until
+                    # it is sent, then the deadline is set again
+                    command.deadline = Timeout(command.timeout)
+                self._queue.append(command)
+                self._send_queued()
+        if lost is not None:
+            command.set_exception(ATException(lost))
+        return command
+
+    def command(self, command, prefix=None, final=None, timeout=5):
+        """\
+        Send a command and wait for its final result code. Returns the list of
+        information response lines. Raises ATCommandError or ATTimeout.
+        """
+        return self.wait(self.submit(command, prefix, final, timeout))
+
+    def wait(self, command):
+        """\
+        Wait for the final result code of a submitted command. Returns the list
+        of information response lines. Raises ATCommandError or ATTimeout.
+        """
+        while True:
+            try:
+                return command.result(command.time_left())
+            except concurrent.futures.TimeoutError:
+                self.check_timeouts()
+
+    def query(self, command, prefix=None, final=None, timeout=5):
+        """\
+        Send a command and return its first '+XXX:' information response,
+        parsed by the URC registry (e.g. 'AT+CSQ' -> CSQ(rssi=20, ber=99)), or
+        None if there was none.
+        """
+        return self.parse_response(self.command(ATCommand(command, prefix, final, timeout)))
+
+    def parse_response(self, lines):
+        """Parse the first '+XXX:' line of a command result, None if there is none"""
+        for line in lines:
+            if urc_token(line) is not None:
+                return self.urc.parse(line)[1]
+        return None
+
+    def send_data(self, command, payload, prefix=None, final=None, timeout=5, mtu=256):
+        """\
+        Queue a data command, e.g. send_data('AT+TCPSEND=1,5', b'hello'), and
+        return its ATCommand future.
+        """
+        return self.submit(ATDataCommand(command, payload, prefix, final, timeout, mtu=mtu))
+
+    def _send_queued(self):
+        """Write queued commands, call with lock held to keep the order"""
+        if self.transport is None:
+            return  # sent by connection_made
+        while self._queue and len(self._in_flight) < self.max_in_flight and self._prompt_for is None:
+            if isinstance(self._queue[0], ATDataCommand) and self._in_flight:
+                break   # the prompt must not be mixed up with other responses
+            command = self._queue.popleft()
+            if not command.set_running_or_notify_cancel():
+                continue    # cancelled while queued
+            command.deadline = Timeout(command.timeout)
+            self._in_flight.append(command)
+            if isinstance(command, ATDataCommand):
+                self._prompt_for = command
+            self.logger.debug('-> {!r}'.format(command.command))
+            self.transport.write(command.command.encode(self.ENCODING, self.UNICODE_HANDLING) + self.COMMAND_TERMINATOR)
+
+    def _forget(self, command):
+        """A command completed or failed, call with lock held"""
+        if self._prompt_for is command:
+            self._prompt_for = None
+
+    def check_timeouts(self):
+        """\
+        Fail the in-flight commands that have timed out, each one by its own
+        deadline; responses that arrive later are assigned to the following
+        commands. Commands that were queued before the port was connected
+        and are still not sent expire too. Timeouts are checked lazily, by
+        waiting callers of command() and when a command completes; event
+        loops call this from a timer.
+        """
+        expired = []
+        with self._lock:
+            for command in list(self._in_flight):
+                if command.deadline.expired():
+                    self._in_flight.remove(command)
+                    self._forget(command)
+                    expired.append(command)
+            for command in list(self._queue):
+                # only commands queued while unconnected have a deadline
+                if command.deadline is not None and command.deadline.expired():
+                    self._queue.remove(command)
+                    expired.append(command)
+            if expired:
+                self._send_queued()
+        for command in expired:
+            command.set_exception(ATTimeout('AT command timeout ({!r})'.format(command.command)))
+
+    # - - receiving
+
+    def data_received(self, data):
+        """Split lines, except for payload echos, and detect data prompts"""
+        while data:
+            if self._raw_remaining:
+                n = min(self._raw_remaining, len(data))
+                self._raw_remaining -= n
+                data = data[n:]
+            else:
+                data = self._split_lines(data)
+
+    def _split_lines(self, data):
+        """\
+        Split lines like Packetizer.data_received(), but stop as soon as a
+        prompt switches to raw mode. Returns the data behind the prompt, it
+        starts with the echo of the payload.
+        """
+        lenterm = len(self.TERMINATOR)
+        pos = min(self._scanned, max(0, len(self.buffer) - lenterm + 1))
+        self.buffer.extend(data)
+        start = 0
+        try:
+            while not self._raw_remaining:
+                pos = self.buffer.find(self.TERMINATOR, pos)
+                if pos < 0:
+                    pos = len(self.buffer) - lenterm + 1
+                    break
+                packet = self.buffer[start:pos]
+                start = pos = pos + lenterm
+                self.handle_packet(packet)
+        finally:
+            del self.buffer[:start]
+            self._scanned = max(0, pos - start)
+        if not self._raw_remaining and self._prompt_for is not None:
+            self._check_prompt(self._prompt_for)
+        if self._raw_remaining:
+            rest = bytes(self.buffer)
+            del self.buffer[:]
+            return rest
+        return b''
+
+    def _check_prompt(self, command):
+        """Look for the prompt in the unterminated rest of the input"""
+        rest = self.buffer.lstrip(b'\r\n')
+        if not rest.startswith(command.prompt):
+            return
+        end = len(self.buffer) - len(rest) + len(command.prompt)
+        if self.buffer[end:end + 1] == b' ':
+            end += 1
+        del self.buffer[:end]
+        self._send_payload(command)
+
+    def _send_payload(self, command):
+        """The prompt was received, write the payload"""
+        if command.echoed:
+            # the modem echoes the payload too
+            self._raw_remaining = len(command.payload)
+        self.logger.debug('-> {} bytes payload'.format(len(command.payload)))
+        payload = memoryview(command.payload)
+        for start in range(0, len(payload), command.mtu):
+            self.transport.write(payload[start:start + command.mtu])
+        with self._lock:
+            self._forget(command)
+            self._send_queued()
+
+    def handle_line(self, line):
+        """Assign a line to the command that is answered or handle it as URC"""
+        # the echo of a command ends with a CR only
+        line = line.rstrip('\r')
+        if not line:
+            return
+        self.logger.debug('<- {!r}'.format(line))
+        command = self._prompt_for
+        if command is not None and line.rstrip(' ') == command.prompt.decode(self.ENCODING):
+            # the prompt is split off as line if more data arrived behind it
+            self._send_payload(command)
+            return
+        done = None
+        with self._lock:
+            for command in self._in_flight:
+                # skip the echo of the command, in case echo is on
+                if not command.echoed and line == command.command:
+                    command.echoed = True
+                    return
+            if self._in_flight:
+                command = self._in_flight[0]
+                result = command.final(line)
+                if result is None:
+                    if command.owns(line):
+                        command.lines.append(line)
+                        return
+                else:
+                    self._in_flight.popleft()
+                    self._forget(command)
+                    self._send_queued()
+                    done = (command, result)
+        if done is not None:
+            command, result = done
+            if result:
+                if urc_token(line) is not None:
+                    # completed by an information response (final_response)
+                    command.lines.append(line)
+                command.set_result(command.lines)
+            else:
+                command.set_exception(ATCommandError(command.command, line, command.lines))
+            self.check_timeouts()
+        else:
+            self.handle_urc(line)
+
+    def handle_urc(self, line):
+        """\
+        Unsolicited result code received, pass it to the subscribers in the
+        URC registry. Called from the reader, so it must not block.
+        """
+        if not self.urc.dispatch(line):
+            self.logger.info('unhandled URC: {!r}'.format(line))
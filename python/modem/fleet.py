@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+#
+# Drive many modems from one asyncio event loop
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Manage a fleet of AT command modems with one asyncio event loop for all
+ports (serial.aio), instead of a reader and an event thread per modem.
+
+Ports are discovered with serial.tools.list_ports. Each modem runs through
+the states 'opening', 'init', 'ready' (or 'failed'), the init scripts of all
+modems run concurrently. Registration is tracked from URCs (ModemState),
+signal quality and IP address are polled at a low rate. health() and
+summary() report the state of the whole fleet.
+"""
+import asyncio
+import collections
+import logging
+
+import serial
+import serial.aio
+from serial.tools import list_ports
+
+from modem.at import ATCommandError, ATEngine
+from modem.state import ModemState, REGISTERED
+
+
+# commands sent to every modem after opening the port
+INIT_SCRIPT = ('AT', 'ATE0', 'AT+CMEE=1')
+
+Health = collections.namedtuple('Health', 'port state csq registered ip error')
+
+
+def discover(pattern=None):
+    """\
+    Return the device names of the serial ports. pattern is a regular
+    expression that is searched in the port name, description and hardware
+    ID (see serial.tools.list_ports.grep), e.g. the USB VID:PID of the modems.
+    """
+    ports = list_ports.grep(pattern) if pattern else list_ports.comports()
+    return sorted(port.device for port in ports)
+
+
+class FleetEngine(ATEngine):
+    """ATEngine that reports a closed port to its Modem instead of raising"""
+
+    def __init__(self, modem):
+        super(FleetEngine, self).__init__()
+        self.modem = modem
+
+    def connection_lost(self, exc):
+        try:
+            super(FleetEngine, self).connection_lost(exc)
+        except Exception:
+            pass    # reported below
+        self.modem.connection_lost(exc)
+
+
+class Modem(object):
+    """One modem of the fleet and its state"""
+
+    def __init__(self, fleet, port):
+        self.fleet = fleet
+        self.port = port
+        self.logger = logging.getLogger('modem.fleet.{}'.format(port))
+        self.state = 'closed'
+        self.engine = None
+        self.transport = None
+        self.registration = None    # ModemState
+        self.csq = None
+        self.ip = None
+        self.error = None
+
+    async def command(self, command, **kwargs):
+        """Send a command without blocking the loop, returns the response lines"""
+        return await asyncio.wrap_future(self.engine.submit(command, **kwargs))
+
+    async def query(self, command, **kwargs):
+        """Like command() but returns the parsed information response"""
+        return self.engine.parse_response(await self.command(command, **kwargs))
+
+    async def start(self):
+        """Open the port and run the init script"""
+        try:
+            self.state = 'opening'
+            self.transport, self.engine = await serial.aio.create_serial_connection(
+                self.fleet.loop, lambda: FleetEngine(self), self.port, **self.fleet.serial_kwargs)
+            self.state = 'init'
+            # the engine queues the commands, there is no need to wait for
+            # each response before sending the next command
+            self.registration = ModemState(self.engine)
+            commands = list(self.fleet.init_script) + list(ModemState.SETUP)
+            results = await asyncio.gather(
+                *[self.command(command) for command in commands],
+                return_exceptions=True)
+            for command, result in zip(commands, results):
+                if isinstance(result, ATCommandError) and command in ModemState.SETUP:
+                    continue    # e.g. no AT+CGREG on a GSM only module, no URCs then
+                if isinstance(result, Exception):
+                    raise result
+            results = await asyncio.gather(
+                *[self.command(command) for command in ModemState.QUERIES],
+                return_exceptions=True)
+            for lines in results:
+                if isinstance(lines, Exception):
+                    continue    # e.g. no SIM, the state stays unknown
+                for line in lines:
+                    token, value = self.engine.urc.parse(line)
+                    if token in ModemState.TOKENS:
+                        self.registration.update(token, value)
+            self.state = 'ready'
+            await self.poll()
+        except Exception as e:
+            self.fail(e)
+
+    async def poll(self):
+        """Read the values that are not reported by URCs"""
+        csq, xiic = await asyncio.gather(
+            self.query('AT+CSQ'), self.query('AT+XIIC?'), return_exceptions=True)
+        if not isinstance(csq, Exception) and csq is not None:
+            self.csq = csq.rssi
+        if not isinstance(xiic, Exception) and xiic is not None:
+            self.ip = xiic.ip
+
+    def fail(self, error):
+        self.logger.warning('failed: {}'.format(error))
+        self.state = 'failed'
+        self.error = error
+        if self.transport is not None:
+            self.transport.abort()
+
+    def connection_lost(self, exc):
+        if self.state not in ('failed', 'closed'):
+            self.state = 'failed'
+            self.error = exc or serial.SerialException('port closed')
+        self.transport = None
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+        self.state = 'closed'
+
+    def health(self):
+        registered = None
+        if self.registration is not None and self.registration.creg is not None:
+            registered = self.registration.creg in REGISTERED
+        return Health(self.port, self.state, self.csq, registered, self.ip, self.error)
+
+
+class Fleet(object):
+    """\
+    All modems, driven by one asyncio event loop. serial_kwargs are passed
+    to serial.serial_for_url for each port.
+    """
+
+    def __init__(self, ports, loop=None, init_script=INIT_SCRIPT, poll_interval=30, timeout_interval=0.5, **serial_kwargs):
+        self.loop = loop
+        self.init_script = init_script
+        self.poll_interval = poll_interval
+        self.timeout_interval = timeout_interval
+        self.serial_kwargs = serial_kwargs
+        self.modems = collections.OrderedDict((port, Modem(self, port)) for port in ports)
+        self._timer = None
+        self._poller = None
+
+    async def start(self):
+        """Open all ports and run the init scripts concurrently"""
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        self._check_timeouts()
+        await asyncio.gather(*[modem.start() for modem in self.modems.values()])
+        self._poller = asyncio.ensure_future(self._poll())
+
+    def _check_timeouts(self):
+        """\
+        Timer for the lazy timeouts of the engines, one for the whole fleet
+        instead of one per command.
+        """
+        for modem in self.modems.values():
+            if modem.engine is not None and modem.transport is not None:
+                modem.engine.check_timeouts()
+        self._timer = self.loop.call_later(self.timeout_interval, self._check_timeouts)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await asyncio.gather(*[
+                modem.poll() for modem in self.modems.values() if modem.state == 'ready'])
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._poller is not None:
+            self._poller.cancel()
+        for modem in self.modems.values():
+            modem.close()
+
+    def health(self):
+        """Return a list of Health tuples, one per modem"""
+        return [modem.health() for modem in self.modems.values()]
+
+    def summary(self):
+        """Aggregate health: number of modems per state and registered modems"""
+        health = self.health()
+        states = collections.Counter(h.state for h in health)
+        return {
+            'modems': len(health),
+            'states': dict(states),
+            'registered': sum(1 for h in health if h.registered),
+            'with_ip': sum(1 for h in health if h.ip not in (None, '0.0.0.0')),
+        }
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# test
+if __name__ == '__main__':
+    # pylint: disable=wrong-import-position
+    import sys
+
+    async def main():
+        fleet = Fleet(discover(sys.argv[1] if len(sys.argv) > 1 else None), baudrate=115200)
+        await fleet.start()
+        for health in fleet.health():
+            sys.stdout.write('{}\n'.format(health))
+        sys.stdout.write('{}\n'.format(fleet.summary()))
+        fleet.close()
+
+    asyncio.run(main())
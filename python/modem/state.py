@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#
+# Track SIM and network registration state from URCs
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Keep the SIM and registration state of a modem up to date from the
+unsolicited +CPIN, +CREG and +CGREG result codes, so that the bring-up can
+wait for a condition instead of polling the modem.
+"""
+import concurrent.futures
+import threading
+
+from modem.at import ATCommandError
+
+
+# <stat> values of +CREG/+CGREG that mean registered: home network, roaming
+REGISTERED = (1, 5)
+
+
+def _sim_ready(state):
+    return state.cpin == 'READY'
+
+
+def _registered(state):
+    return state.creg in REGISTERED
+
+
+def _gprs_registered(state):
+    return state.cgreg in REGISTERED
+
+
+class ModemState(object):
+    """\
+    SIM (cpin) and registration (creg, cgreg) state of the modem driven by
+    engine (an ATEngine). The attributes are None while unknown.
+
+    Conditions are callables that get this object, or one of the names in
+    CONDITIONS. Waiting does not poll the modem: waiters are futures that the
+    reader resolves when a URC makes the condition true.
+    """
+
+    CONDITIONS = {
+        'sim_ready': _sim_ready,
+        'registered': _registered,
+        'gprs_registered': _gprs_registered,
+    }
+
+    # token -> (attribute, value conversion)
+    TOKENS = {
+        '+CPIN': ('cpin', lambda value: value),
+        '+CREG': ('creg', lambda value: value.stat),
+        '+CGREG': ('cgreg', lambda value: value.stat),
+    }
+
+    # commands that enable the URCs and queries for the initial state
+    SETUP = ('AT+CREG=1', 'AT+CGREG=1')
+    QUERIES = ('AT+CPIN?', 'AT+CREG?', 'AT+CGREG?')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.cpin = None
+        self.creg = None
+        self.cgreg = None
+        self._lock = threading.Lock()
+        self._waiters = []  # (predicate, future)
+        for token in self.TOKENS:
+            engine.urc.subscribe(token, self.update)
+
+    def start(self):
+        """\
+        Enable the registration URCs and read the current state. Must not be
+        called from the reader thread, it waits for the responses.
+        """
+        for command in self.SETUP:
+            try:
+                self.engine.command(command)
+            except ATCommandError:
+                # e.g. no AT+CGREG on a GSM only module, there are no URCs
+                # then, the queries below still read the state once
+                continue
+        for command in self.QUERIES:
+            try:
+                value = self.engine.query(command)
+            except ATCommandError:
+                # e.g. +CME ERROR: SIM not inserted, the state stays unknown
+                continue
+            if value is not None:
+                self.update(command[2:].rstrip('?'), value)
+
+    def update(self, token, value):
+        """Set the state from a parsed response or URC and wake up waiters"""
+        attribute, convert = self.TOKENS[token]
+        ready = []
+        with self._lock:
+            setattr(self, attribute, convert(value))
+            for waiter in list(self._waiters):
+                predicate, future = waiter
+                if future.done():
+                    self._waiters.remove(waiter)    # cancelled
+                elif predicate(self):
+                    self._waiters.remove(waiter)
+                    ready.append(future)
+        for future in ready:
+            if future.set_running_or_notify_cancel():
+                future.set_result(True)
+
+    def when(self, condition):
+        """\
+        Return a future that is resolved as soon as condition holds, it is
+        already done if it holds now.
+        """
+        predicate = self.CONDITIONS.get(condition, condition)
+        future = concurrent.futures.Future()
+        with self._lock:
+            if predicate(self):
+                future.set_running_or_notify_cancel()
+                future.set_result(True)
+            else:
+                self._waiters.append((predicate, future))
+        return future
+
+    def wait_for(self, condition, timeout=None):
+        """\
+        Wait until condition holds, returns True or False on timeout. It
+        returns immediately if the condition already holds.
+        """
+        future = self.when(condition)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # fails if the condition became true in the meantime
+            return not future.cancel()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Send data over the TCP stack of the modem (AT+TCPSEND)
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Bulk transfer over a TCP link of the modem's internal stack, opened with
+AT+TCPSETUP. Data is split into segments, each one sent with
+'AT+TCPSEND=<link>,<length>' in data mode. The next segment is sent as soon
+as the modem accepted the previous one (OK), the '+TCPSEND: <link>,<length>'
+acknowledgements only limit the amount of data in flight (window).
+"""
+import threading
+
+import serial
+from serial.serialutil import Timeout
+
+from modem.at import ATDataCommand, ATException, ATTimeout
+
+
+class TCPLink(object):
+    """\
+    Sending side of a TCP link of the modem. segment_size is the maximum
+    length of one AT+TCPSEND, mtu the size of the writes to the port and
+    window the number of bytes that may be sent but not acknowledged.
+
+    The methods block, they must not be called from the reader thread.
+    """
+
+    def __init__(self, engine, link, segment_size=1024, window=4096, mtu=256, timeout=10):
+        self.engine = engine
+        self.link = link
+        self.segment_size = segment_size
+        self.window = window
+        self.mtu = mtu
+        self.timeout = timeout
+        self.queued = 0     # bytes passed to the engine
+        self.acked = 0      # bytes acknowledged with +TCPSEND
+        self.error = None
+        self._condition = threading.Condition()
+        engine.urc.subscribe('+TCPSEND', self._acknowledged)
+
+    def close(self):
+        """Stop listening for acknowledgements"""
+        self.engine.urc.unsubscribe('+TCPSEND', self._acknowledged)
+
+    def _acknowledged(self, token, ack):
+        if ack.link == self.link:
+            with self._condition:
+                self.acked += ack.length
+                self._condition.notify_all()
+
+    def _segment_done(self, command):
+        error = ATException('cancelled') if command.cancelled() else command.exception()
+        if error is not None:
+            with self._condition:
+                # the segment will not be acknowledged
+                self.queued -= len(command.payload)
+                self.error = error
+                self._condition.notify_all()
+
+    def _wait(self, predicate, timeout, what):
+        """Wait with the condition held until predicate() is true"""
+        timeout = Timeout(timeout)
+        while not predicate():
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise ATException('sending on link {} failed: {}'.format(self.link, error))
+            if timeout.expired():
+                raise ATTimeout('link {}: {}'.format(self.link, what))
+            self._condition.wait(timeout.time_left())
+
+    def send(self, data, timeout=None):
+        """\
+        Queue data for sending and return the list of segment commands
+        (futures). Blocks while the window is full.
+        """
+        data = memoryview(serial.to_bytes(data))
+        commands = []
+        for start in range(0, len(data), self.segment_size):
+            segment = data[start:start + self.segment_size]
+            with self._condition:
+                self._wait(
+                    lambda: self.queued - self.acked + len(segment) <= self.window or self.queued == self.acked,
+                    timeout, 'send window full')
+                self.queued += len(segment)
+            command = ATDataCommand(
+                'AT+TCPSEND={},{}'.format(self.link, len(segment)), segment,
+                prefix=(),  # +TCPSEND lines are acknowledgements, handled as URC
+                timeout=self.timeout, mtu=self.mtu)
+            command.add_done_callback(self._segment_done)
+            commands.append(self.engine.submit(command))
+        return commands
+
+    def flush(self, timeout=None):
+        """Wait until all data is acknowledged"""
+        with self._condition:
+            self._wait(lambda: self.acked >= self.queued, timeout, 'not acknowledged')
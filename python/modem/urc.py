@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+#
+# Parsers and dispatcher for '+XXX: ...' response lines
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Table driven parsing of information responses and unsolicited result codes
+(URCs). A line '+XXX: a,b,c' is split once at the ':', the token '+XXX' is
+looked up in a dict of parsers and subscribers, so the cost per line does
+not depend on the number of known prefixes.
+
+Parsers for the common 3GPP TS 27.007 and the N10 TCP stack responses are
+predefined, other modules add theirs with register_parser().
+"""
+import collections
+import logging
+
+
+def split_line(line):
+    """\
+    Split '+XXX: rest' into ('+XXX', 'rest'). Lines without ':' (e.g. 'RING')
+    are returned as (line, None).
+    """
+    colon = line.find(':')
+    if colon > 0:
+        return line[:colon], line[colon + 1:].lstrip()
+    return line, None
+
+
+def _text(value):
+    """Field converter: remove surrounding quotes"""
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _int(value):
+    """Field converter: decimal integer"""
+    return int(value)
+
+
+def _hex(value):
+    """Field converter: quoted or plain hex number, e.g. a LAC"""
+    return int(_text(value), 16)
+
+
+def fields(record, *converters):
+    """\
+    Return a parser for comma separated fields, e.g. '20,99'. Each field is
+    passed to the converter at the same position and the results are
+    returned as record (a namedtuple). The last field gets the remaining text,
+    commas included. Missing optional fields are None.
+    """
+    maxsplit = len(converters) - 1
+
+    def parse(value):
+        values = [None] * len(converters)
+        for i, field in enumerate(value.split(',', maxsplit)):
+            field = field.strip()
+            if field:
+                values[i] = converters[i](field)
+        return record(*values)
+    return parse
+
+
+def text(value):
+    """Parser for responses with a single text value, e.g. '+CPIN: READY'"""
+    return _text(value.strip())
+
+
+def integer(value):
+    """Parser for responses with a single number, e.g. '+CGATT: 1'"""
+    return int(value)
+
+
+CSQ = collections.namedtuple('CSQ', 'rssi ber')
+Registration = collections.namedtuple('Registration', 'stat lac ci act')
+XIIC = collections.namedtuple('XIIC', 'state ip')
+TCPResult = collections.namedtuple('TCPResult', 'link result')
+TCPLength = collections.namedtuple('TCPLength', 'link length')
+TCPRecv = collections.namedtuple('TCPRecv', 'link length data')
+
+_registration_urc = fields(Registration, _int, _hex, _hex, _int)
+_registration_read = fields(
+    collections.namedtuple('_Registration', 'n stat lac ci act'), _int, _int, _hex, _hex, _int)
+
+
+def registration(value):
+    """\
+    Parser for +CREG/+CGREG/+CEREG. The read command response has the mode
+    <n> as first field ('0,1', '2,1,"1A2B","01C3",7'), the URC does not
+    ('1', '1,"1A2B","01C3",7'). The access technology <AcT> is optional.
+    Both are returned as Registration(stat, lac, ci, act).
+    """
+    head, _, tail = value.partition(',')
+    if not tail or tail.lstrip().startswith('"'):
+        return _registration_urc(value)
+    n, stat, lac, ci, act = _registration_read(value)
+    return Registration(stat, lac, ci, act)
+
+
+PARSERS = {
+    '+CGMR': text,
+    '+CCID': text,
+    '+CPIN': text,
+    '+CSQ': fields(CSQ, _int, _int),
+    '+CREG': registration,
+    '+CGREG': registration,
+    '+CEREG': registration,
+    '+CGATT': integer,
+    '+XIIC': fields(XIIC, _int, _text),
+    '+TCPSETUP': fields(TCPResult, _int, _text),
+    '+TCPCLOSE': fields(TCPResult, _int, _text),
+    '+TCPACK': fields(TCPResult, _int, _text),
+    '+TCPSEND': fields(TCPLength, _int, _int),
+    '+TCPRECV': fields(TCPRecv, _int, _int, str),
+}
+
+
+def register_parser(token, parser):
+    """Add or replace the parser for token ('+XXX') for all registries"""
+    PARSERS[token] = parser
+
+
+class URCRegistry(object):
+    """\
+    Parse lines by their token and dispatch them to subscribers. Parsers
+    registered with the instance take precedence over the module wide
+    PARSERS. Unknown tokens are returned as the stripped text after ':'.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('modem.urc')
+        self.parsers = {}
+        self._subscribers = {}
+
+    def register_parser(self, token, parser):
+        """Add or replace the parser for token ('+XXX') for this registry"""
+        self.parsers[token] = parser
+
+    def subscribe(self, token, callback):
+        """Call callback(token, value) for each URC with the given token"""
+        self._subscribers.setdefault(token, []).append(callback)
+
+    def unsubscribe(self, token, callback):
+        self._subscribers[token].remove(callback)
+
+    def _convert(self, token, value):
+        if value is None:
+            return None
+        parser = self.parsers.get(token) or PARSERS.get(token)
+        if parser is None:
+            return value
+        return parser(value)
+
+    def parse(self, line):
+        """Return (token, value) for a response line"""
+        token, value = split_line(line)
+        return token, self._convert(token, value)
+
+    def dispatch(self, line):
+        """\
+        Parse a URC and call the subscribers of its token. Returns False if
+        there are none. Lines nobody subscribed to are not parsed.
+        """
+        token, value = split_line(line)
+        callbacks = self._subscribers.get(token)
+        if not callbacks:
+            return False
+        try:
+            value = self._convert(token, value)
+        except ValueError:
+            # e.g. '+TCPSEND: 1,Error' where a length is expected
+            self.logger.warning('can not parse URC {!r}'.format(line))
+            return True
+        for callback in list(callbacks):
+            try:
+                callback(token, value)
+            except Exception:
+                # one failing subscriber must not stop the reader
+                self.logger.exception('URC subscriber for {}'.format(token))
+        return True
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+#
+# Working with asyncio and pySerial
+#
+# This file is part of pySerial. https://github.com/pyserial/pyserial
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Support asyncio with serial ports. The file descriptor of the port is watched
+by the event loop (loop.add_reader/add_writer), so this works for the POSIX
+backend and the socket:// URL handler but not on Windows.
+
+The protocols of serial.threaded (Protocol, Packetizer, LineReader,
+FramedPacket) can be used with SerialTransport as well as asyncio protocols.
+"""
+import asyncio
+
+import serial
+
+
+class SerialTransport(asyncio.Transport):
+    """\
+    asyncio transport for a serial port. The port is switched to non-blocking
+    mode (timeout and write_timeout are set to 0).
+
+    For compatibility with the ReaderThread, the serial instance is also
+    available as attribute ``serial``.
+    """
+
+    max_read_size = 1024
+
+    def __init__(self, loop, protocol, serial_instance):
+        super(SerialTransport, self).__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self.serial = serial_instance
+        self._closing = False
+        self._reading = False
+        self._protocol_paused = False
+        self._write_buffer = bytearray()
+        self._has_writer = False
+        self._high_water = 64 * 1024
+        self._low_water = 16 * 1024
+        self.serial.timeout = 0
+        self.serial.write_timeout = 0
+        self._fileno = self.serial.fileno()
+        loop.call_soon(protocol.connection_made, self)
+        loop.call_soon(self.resume_reading)
+
+    def get_extra_info(self, name, default=None):
+        """Supported: 'serial'"""
+        if name == 'serial':
+            return self.serial
+        return default
+
+    def get_protocol(self):
+        return self._protocol
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def is_closing(self):
+        return self._closing
+
+    #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
+    # reading
+
+    def is_reading(self):
+        return self._reading
+
+    def pause_reading(self):
+        """Stop calling the protocol's data_received() method"""
+        if self._reading:
+            self._loop.remove_reader(self._fileno)
+            self._reading = False
+
+    def resume_reading(self):
+        """Resume calling the protocol's data_received() method"""
+        if not self._reading and not self._closing:
+            self._loop.add_reader(self._fileno, self._read_ready)
+            self._reading = True
+
+    def _read_ready(self):
+        try:
+            data = self.serial.read(self.max_read_size)
+        except serial.SerialException as e:
+            # probably some I/O problem such as disconnected USB serial
+            # adapters -> close the transport
+            self._close(e)
+        else:
+            if data:
+                self._protocol.data_received(data)
+
+    #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
+    # writing
+
+    def write(self, data):
+        """\
+        Write data to the port, without blocking. What can not be written
+        immediately is buffered and sent when the port is ready.
+        """
+        if self._closing:
+            return
+        if not self._write_buffer:
+            try:
+                n = self.serial.write(data)
+            except serial.SerialException as e:
+                self._fatal_error(e)
+                return
+            if n == len(data):
+                return
+            data = memoryview(data)[n:]
+            self._loop.add_writer(self._fileno, self._write_ready)
+            self._has_writer = True
+        self._write_buffer += data
+        self._maybe_pause_protocol()
+
+    def _write_ready(self):
+        try:
+            n = self.serial.write(self._write_buffer)
+        except serial.SerialException as e:
+            self._fatal_error(e)
+            return
+        del self._write_buffer[:n]
+        self._maybe_resume_protocol()
+        if not self._write_buffer:
+            self._loop.remove_writer(self._fileno)
+            self._has_writer = False
+            if self._closing:
+                self._close()
+
+    def can_write_eof(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return len(self._write_buffer)
+
+    def get_write_buffer_limits(self):
+        return (self._low_water, self._high_water)
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        """\
+        Set the high- and low-water limits for write flow control. The
+        protocol's pause_writing() and resume_writing() methods are called
+        (if it has them) when the limits are crossed.
+        """
+        if high is None:
+            high = 64 * 1024 if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError('high ({!r}) must be >= low ({!r}) must be >= 0'.format(high, low))
+        self._high_water = high
+        self._low_water = low
+        self._maybe_pause_protocol()
+
+    def _maybe_pause_protocol(self):
+        if not self._protocol_paused and self.get_write_buffer_size() > self._high_water:
+            self._protocol_paused = True
+            pause_writing = getattr(self._protocol, 'pause_writing', None)
+            if pause_writing is not None:
+                pause_writing()
+
+    def _maybe_resume_protocol(self):
+        if self._protocol_paused and self.get_write_buffer_size() <= self._low_water:
+            self._protocol_paused = False
+            resume_writing = getattr(self._protocol, 'resume_writing', None)
+            if resume_writing is not None:
+                resume_writing()
+
+    #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
+    # closing
+
+    def close(self):
+        """\
+        Close the transport after all buffered data is written. The
+        protocol's connection_lost() is called with None.
+        """
+        if not self._closing:
+            self._closing = True
+            self.pause_reading()
+            if not self._write_buffer:
+                self._loop.call_soon(self._close)
+
+    def abort(self):
+        """Close the transport immediately, buffered data is lost"""
+        self._closing = True
+        self._close()
+
+    def _fatal_error(self, exc):
+        self._closing = True
+        self._close(exc)
+
+    def _close(self, exc=None):
+        self._closing = True
+        self.pause_reading()
+        if self._has_writer:
+            self._loop.remove_writer(self._fileno)
+            self._has_writer = False
+        del self._write_buffer[:]
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+            self._loop.call_soon(self._protocol.connection_lost, exc)
+
+
+async def create_serial_connection(loop, protocol_factory, *args, **kwargs):
+    """\
+    Open a serial port (all arguments are passed to serial.serial_for_url)
+    and connect it to a protocol instance. Returns (transport, protocol).
+    """
+    serial_instance = serial.serial_for_url(*args, **kwargs)
+    protocol = protocol_factory()
+    transport = SerialTransport(loop, protocol, serial_instance)
+    return (transport, protocol)
+
+
+async def open_serial_connection(*args, limit=2 ** 16, **kwargs):
+    """\
+    Open a serial port (all other arguments are passed to
+    serial.serial_for_url) and return a (StreamReader, StreamWriter) pair.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=limit)
+    protocol = asyncio.StreamReaderProtocol(reader)
+    transport, _ = await create_serial_connection(loop, lambda: protocol, *args, **kwargs)
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    return (reader, writer)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# test
+if __name__ == '__main__':
+    # pylint: disable=wrong-import-position
+    import sys
+
+    PORT = sys.argv[1] if len(sys.argv) > 1 else 'socket://localhost:7000'
+
+    async def main():
+        reader, writer = await open_serial_connection(PORT, baudrate=115200)
+        writer.write(b'hello\r\n')
+        await writer.drain()
+        sys.stdout.write('line received: {!r}\n'.format(await reader.readline()))
+        writer.close()
+
+    asyncio.run(main())
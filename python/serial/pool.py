@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+#
+# Reuse network connections (socket://, rfc2217://) between users
+#
+# This file is part of pySerial. https://github.com/pyserial/pyserial
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+A pool of open socket:// and rfc2217:// ports, keyed by URL. Closing a port
+obtained from the pool returns the connection to the pool instead of closing
+it, the next serial_for_url() with the same URL reuses it without a new TCP
+connection and (for RFC 2217) Telnet negotiation. The serial settings are
+applied again on reuse, unchanged settings cost nothing.
+
+Idle connections are kept for max_idle seconds. Their sockets use TCP
+keepalive and they are checked before reuse: a connection that the remote
+closed in the meantime is dropped and a new one is opened.
+
+The ports handed out are PooledSerial instances. When a read or write fails
+because the connection was lost, the port is reopened, with exponential
+backoff between the attempts, and the call is repeated once. Data that was
+in transit is lost, a write that failed halfway may be sent twice.
+
+    import serial.pool
+    with serial.pool.serial_for_url('rfc2217://localhost:7000', 115200, timeout=1) as s:
+        s.write(b'hello')
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+
+import serial
+from serial.serialutil import SerialBase, SerialException, SerialTimeoutException, portNotOpenError
+
+
+# protocols whose connections can be reused
+SCHEMES = ('socket', 'rfc2217')
+
+
+def _scheme(url):
+    scheme, separator, _ = url.partition('://')
+    return scheme.lower() if separator else None
+
+
+def _alive(port):
+    """Check a connection that is not in use, without blocking"""
+    if not port.is_open or getattr(port, '_socket', None) is None:
+        return False
+    if getattr(port, '_thread', True) is None:
+        return False    # the rfc2217 reader thread saw the connection close
+    sock = port._socket
+    if sock.gettimeout() != 0:
+        return True     # blocking socket (rfc2217), its reader thread watches it
+    try:
+        return bool(sock.recv(1, socket.MSG_PEEK))
+    except (BlockingIOError, InterruptedError):
+        return True     # nothing received, still connected
+    except OSError:
+        return False
+
+
+class PooledSerial(object):
+    """\
+    A port checked out from a ConnectionPool. Attributes and methods are
+    those of the underlying port, close() returns the connection to the
+    pool. I/O that fails with a lost connection is retried once on a new
+    connection.
+    """
+
+    RECONNECT = ('read', 'readinto', 'read_some', 'read_until', 'readline',
+                 'write', 'write_many', 'flush')
+
+    def __init__(self, pool, url, port):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_url', url)
+        object.__setattr__(self, '_port', port)
+
+    def __getattr__(self, name):
+        if self._port is None:
+            raise portNotOpenError
+        attribute = getattr(self._port, name)
+        if name in self.RECONNECT:
+            return lambda *args, **kwargs: self._call(name, args, kwargs)
+        return attribute
+
+    def __setattr__(self, name, value):
+        if self._port is None:
+            raise portNotOpenError
+        setattr(self._port, name, value)
+
+    def _call(self, name, args, kwargs):
+        try:
+            return getattr(self._port, name)(*args, **kwargs)
+        except SerialTimeoutException:
+            raise
+        except SerialException as e:
+            self._pool.reconnect(self._url, self._port, e)
+        return getattr(self._port, name)(*args, **kwargs)
+
+    @property
+    def is_open(self):
+        return self._port is not None and self._port.is_open
+
+    def close(self):
+        """Return the connection to the pool"""
+        port = self._port
+        if port is not None:
+            object.__setattr__(self, '_port', None)
+            self._pool.release(self._url, port)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def __repr__(self):
+        return '{name}<url={url!r}, port={port!r}>'.format(
+            name=self.__class__.__name__, url=self._url, port=self._port)
+
+
+class ConnectionPool(object):
+    """\
+    Idle socket:// and rfc2217:// connections, keyed by URL. Up to max_size
+    idle connections per URL are kept for max_idle seconds. keepalive is a
+    tuple (idle, interval, count) for the TCP keepalive of the sockets, in
+    seconds, or None. A lost connection is reopened up to max_retries
+    times, the first retry after backoff seconds, doubling up to
+    max_backoff. Thread safe.
+    """
+
+    def __init__(self, max_idle=60, max_size=4, keepalive=(30, 10, 3), max_retries=5, backoff=0.1,
+                 max_backoff=5, logger=None):
+        self.max_idle = max_idle
+        self.max_size = max_size
+        self.keepalive = keepalive
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.logger = logger or logging.getLogger('serial.pool')
+        self._lock = threading.Lock()
+        self._idle = {}     # url -> list of (release time, port)
+        self._pid = os.getpid()
+
+    def serial_for_url(self, url, *args, **kwargs):
+        """\
+        Return an open PooledSerial for url, reusing an idle connection if
+        there is one. The parameters are those of serial.serial_for_url.
+        """
+        if _scheme(url) not in SCHEMES:
+            raise ValueError('only {} URLs can be pooled: {!r}'.format(
+                ', '.join('{}://'.format(scheme) for scheme in SCHEMES), url))
+        if kwargs.pop('do_not_open', False):
+            raise ValueError('pooled ports are always open')
+        # validates the parameters and fills in the defaults
+        settings = SerialBase(None, *args, **kwargs).get_settings()
+        while True:
+            port = self._checkout(url)
+            if port is None:
+                break
+            try:
+                port.apply_settings(settings)
+                # like a fresh open, and a round trip to the server for rfc2217
+                port.reset_input_buffer()
+            except SerialException as e:
+                self.logger.debug('dropping {}: {}'.format(url, e))
+                self._discard(port)
+                continue
+            self.logger.debug('reusing {}'.format(url))
+            return PooledSerial(self, url, port)
+        port = serial.serial_for_url(url, *args, **kwargs)
+        self._set_keepalive(port)
+        self.logger.debug('opened {}'.format(url))
+        return PooledSerial(self, url, port)
+
+    def _checkout(self, url):
+        """Return the most recently used healthy idle connection or None"""
+        dead = []
+        found = None
+        with self._lock:
+            self._check_fork()
+            idle = self._idle.get(url, [])
+            deadline = time.monotonic() - self.max_idle
+            while idle:
+                released, port = idle.pop()
+                if released >= deadline and _alive(port):
+                    found = port
+                    break
+                dead.append(port)
+        for port in dead:
+            self._discard(port)
+        return found
+
+    def release(self, url, port):
+        """Put a connection back, it is closed if it is not reusable"""
+        with self._lock:
+            self._check_fork()
+            idle = self._idle.setdefault(url, [])
+            if len(idle) < self.max_size and _alive(port):
+                idle.append((time.monotonic(), port))
+                port = None
+        if port is not None:
+            self._discard(port)
+        self.prune()
+
+    def prune(self):
+        """Close the connections that were idle for more than max_idle seconds"""
+        expired = []
+        deadline = time.monotonic() - self.max_idle
+        with self._lock:
+            for url, idle in list(self._idle.items()):
+                expired.extend(port for released, port in idle if released < deadline)
+                idle[:] = [(released, port) for released, port in idle if released >= deadline]
+                if not idle:
+                    del self._idle[url]
+        for port in expired:
+            self._discard(port)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            self._check_fork()
+            ports = [port for idle in self._idle.values() for released, port in idle]
+            self._idle.clear()
+        for port in ports:
+            self._discard(port)
+
+    def _check_fork(self):
+        """\
+        A forked child must not use the connections of the parent, and must
+        not close them either: shutting down the shared socket would end the
+        parent's connection. Call with lock held.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = {}
+
+    def _discard(self, port):
+        try:
+            port.close()
+        except Exception as e:
+            self.logger.debug('closing {}: {}'.format(port.portstr, e))
+
+    def _set_keepalive(self, port):
+        """Let the OS detect dead peers of idle connections"""
+        sock = getattr(port, '_socket', None)
+        if self.keepalive is None or sock is None:
+            return
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        idle, interval, count = self.keepalive
+        for name, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+            if hasattr(socket, name):   # not on all platforms
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+    def reconnect(self, url, port, error):
+        """\
+        Reopen port after the connection was lost, waiting between the
+        attempts. Raises the last SerialException if all attempts fail.
+        """
+        delay = self.backoff
+        for attempt in range(self.max_retries):
+            if attempt:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+            self.logger.warning('{}: {}, reconnecting ({}/{})'.format(url, error, attempt + 1, self.max_retries))
+            self._discard(port)
+            try:
+                port.open()
+            except SerialException as e:
+                error = e
+            else:
+                self._set_keepalive(port)
+                return
+        raise error
+
+
+POOL = ConnectionPool()
+atexit.register(POOL.close)
+
+
+def serial_for_url(url, *args, **kwargs):
+    """Get an open port for url from the process wide pool POOL"""
+    return POOL.serial_for_url(url, *args, **kwargs)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# test
+if __name__ == '__main__':
+    import sys
+
+    url = sys.argv[1] if len(sys.argv) > 1 else 'rfc2217://localhost:7000'
+    for n in range(5):
+        start = time.time()
+        with serial_for_url(url, timeout=1) as s:
+            s.write(b'hello\n')
+            sys.stdout.write('{}: open and write {:.3f}s\n'.format(n, time.time() - start))
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+#
+# Serve many serial ports from a single thread
+#
+# This file is part of pySerial. https://github.com/pyserial/pyserial
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Serve many serial ports from one thread. The file descriptors of the ports
+(and their abort pipes) are registered once with an epoll object and incoming
+data is dispatched to Protocol instances (see serial.threaded).
+
+Only available on systems that provide select.epoll (Linux).
+"""
+import collections
+import errno
+import fcntl
+import logging
+import os
+import select
+import threading
+
+import serial
+
+
+class SerialTransport(object):
+    """\
+    Transport for a serial port that is served by an EpollReactor. It
+    provides the same interface to the protocol as the ReaderThread does: the
+    attributes ``serial`` and ``protocol`` and the methods write() and close().
+    """
+
+    def __init__(self, reactor, serial_instance, protocol):
+        self.reactor = reactor
+        self.serial = serial_instance
+        self.protocol = protocol
+        self.alive = True
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        """Thread safe writing (uses lock)"""
+        with self._lock:
+            self.serial.write(data)
+
+    def close(self):
+        """Unregister the port from the reactor and close it"""
+        self.reactor.remove_port(self, close=True)
+
+
+class EpollReactor(object):
+    """\
+    Read loop for any number of serial ports, running in one thread. Each
+    port is driven by its own Protocol instance, like it would be by a
+    ReaderThread.
+
+    Registration and removal of ports is thread safe. The protocol callbacks
+    are always called from the thread running the reactor.
+    """
+
+    READ_SIZE = 4096
+
+    def __init__(self):
+        if not hasattr(select, 'epoll'):
+            raise NotImplementedError('epoll is not supported on this platform')
+        self.logger = logging.getLogger('pySerial.reactor')
+        self.alive = False
+        self._epoll = select.epoll()
+        self._transports = {}       # fd of port -> transport
+        self._abort_fds = {}        # fd of abort pipe -> transport
+        self._pending = collections.deque()
+        self._thread = None
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        fcntl.fcntl(self._wakeup_r, fcntl.F_SETFL, os.O_NONBLOCK)
+        fcntl.fcntl(self._wakeup_w, fcntl.F_SETFL, os.O_NONBLOCK)
+        self._epoll.register(self._wakeup_r, select.EPOLLIN)
+
+    def call_soon(self, callback, *args):
+        """Thread safe: run callback(*args) from the reactor thread"""
+        self._pending.append((callback, args))
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b'x')
+        except OSError as e:
+            # pipe full, the reactor is woken up anyway
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def add_port(self, serial_instance, protocol_factory):
+        """\
+        Register an open serial port, the protocol is created immediately and
+        connection_made() is called from the reactor thread. Returns the
+        transport, which has a reference to the protocol instance.
+        """
+        transport = SerialTransport(self, serial_instance, protocol_factory())
+        self.call_soon(self._add, transport)
+        return transport
+
+    def remove_port(self, transport, close=False):
+        """\
+        Unregister a port. The protocol's connection_lost() is called. If
+        close is true, the serial port is closed too.
+        """
+        self.call_soon(self._remove, transport, None, close)
+
+    def _add(self, transport):
+        try:
+            fd = transport.serial.fileno()
+            self._epoll.register(fd, select.EPOLLIN)
+        except (OSError, IOError, serial.SerialException) as e:
+            transport.alive = False
+            self._connection_lost(transport, e)
+            return
+        self._transports[fd] = transport
+        abort_fd = getattr(transport.serial, 'pipe_abort_read_r', None)
+        if abort_fd is not None:
+            self._epoll.register(abort_fd, select.EPOLLIN)
+            self._abort_fds[abort_fd] = transport
+        try:
+            transport.protocol.connection_made(transport)
+        except Exception as e:
+            self._remove(transport, e)
+            return
+        # data that read_until() read ahead is not signalled by epoll
+        data = self._pop_read_ahead(transport)
+        if data:
+            self._data_received(transport, data)
+
+    def _remove(self, transport, error=None, close=False):
+        if transport.alive:
+            transport.alive = False
+            for fds in (self._transports, self._abort_fds):
+                for fd in [fd for fd, t in fds.items() if t is transport]:
+                    del fds[fd]
+                    # closing the port removed its fds from the epoll set
+                    # already, and their numbers may be in use again
+                    if transport.serial.is_open:
+                        self._epoll.unregister(fd)
+            self._connection_lost(transport, error)
+        if close:
+            # use the lock to let other threads finish writing
+            with transport._lock:
+                transport.serial.close()
+
+    def _connection_lost(self, transport, error):
+        # exceptions must not end the loop that serves all the other ports
+        try:
+            transport.protocol.connection_lost(error)
+        except Exception:
+            self.logger.exception('connection_lost of {!r}'.format(transport.serial.name))
+
+    def _pop_read_ahead(self, transport):
+        """Take the data that the port has buffered already, if any"""
+        read_ahead = getattr(transport.serial, '_read_ahead', None)
+        if not read_ahead:
+            return b''
+        data = bytes(read_ahead)
+        del read_ahead[:]
+        return data
+
+    def _read(self, transport, fd):
+        data = self._pop_read_ahead(transport)
+        if data:
+            self._data_received(transport, data)
+            if not transport.alive:
+                return
+        try:
+            data = os.read(fd, self.READ_SIZE)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            # probably some I/O problem such as disconnected USB serial
+            # adapters -> remove port
+            self._remove(transport, serial.SerialException('read failed: {}'.format(e)))
+            return
+        if not data:
+            # Disconnected devices, at least on Linux, show the behavior that
+            # they are always ready to read immediately but reading returns
+            # nothing.
+            self._remove(transport, serial.SerialException(
+                'device reports readiness to read but returned no data '
+                '(device disconnected or multiple access on port?)'))
+            return
+        self._data_received(transport, data)
+
+    def _data_received(self, transport, data):
+        # make a separated try-except for called used code
+        try:
+            transport.protocol.data_received(data)
+        except Exception as e:
+            self._remove(transport, e)
+
+    def _run_pending(self):
+        while self._pending:
+            callback, args = self._pending.popleft()
+            try:
+                callback(*args)
+            except Exception:
+                self.logger.exception('callback {!r}'.format(callback))
+
+    def run(self):
+        """Reactor loop, runs until stop() is called"""
+        self.alive = True
+        while self.alive:
+            self._run_pending()
+            try:
+                events = self._epoll.poll()
+            except (OSError, IOError) as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            for fd, event in events:
+                if fd == self._wakeup_r:
+                    try:
+                        os.read(self._wakeup_r, 1000)
+                    except OSError:
+                        pass
+                elif fd in self._transports:
+                    self._read(self._transports[fd], fd)
+                elif fd in self._abort_fds:
+                    # cancel_read() of a port unregisters it, just like it
+                    # stops a ReaderThread
+                    transport = self._abort_fds[fd]
+                    os.read(fd, 1000)
+                    self._remove(transport)
+        self._run_pending()
+
+    def stop(self):
+        """Stop the reactor loop, ports stay registered"""
+        self.call_soon(setattr, self, 'alive', False)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2)
+            self._thread = None
+
+    def start(self):
+        """Run the reactor loop in a background thread"""
+        self._thread = threading.Thread(target=self.run, name='serial-reactor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _close_ports(self):
+        for transport in set(self._transports.values()):
+            self._remove(transport, close=True)
+
+    def close(self):
+        """Stop the reactor, close all registered ports and release resources"""
+        # the registered ports are only accessed from the reactor thread
+        self.call_soon(self._close_ports)
+        self.stop()
+        if self._thread is None:
+            self._run_pending()
+        self._epoll.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    # - -  context manager, returns reactor
+
+    def __enter__(self):
+        """Enter context handler: start the reactor in a background thread"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Leave context: close all ports"""
+        self.close()
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# test
+if __name__ == '__main__':
+    # pylint: disable=wrong-import-position
+    import sys
+    import time
+    import serial.threaded
+
+    class PrintLines(serial.threaded.LineReader):
+        def connection_made(self, transport):
+            super(PrintLines, self).connection_made(transport)
+            sys.stdout.write('port opened: {}\n'.format(transport.serial.name))
+
+        def handle_line(self, data):
+            sys.stdout.write('{}: line received: {!r}\n'.format(self.transport.serial.name, data))
+
+        def connection_lost(self, exc):
+            sys.stdout.write('port closed ({!r})\n'.format(exc))
+
+    with EpollReactor() as reactor:
+        for port in sys.argv[1:]:
+            reactor.add_port(serial.serial_for_url(port, baudrate=115200), PrintLines)
+        time.sleep(10)
@@ -58,6 +58,8 @@
 #   RFC).
 # the order of the options is not relevant
 
+import collections
+import errno
 import logging
 import socket
 import struct
@@ -68,13 +70,13 @@ try:
 except ImportError:
     import urllib.parse as urlparse
 try:
-    import Queue
+    import selectors
 except ImportError:
-    import queue as Queue
+    selectors = None    # Server is not available
 
 import serial
 from serial.serialutil import SerialBase, SerialException, to_bytes, \
-    iterbytes, portNotOpenError, Timeout
+    portNotOpenError, Timeout
 
 # port string is expected to be something like this:
 # rfc2217://host:port
@@ -317,6 +319,10 @@ class TelnetSubnegotiation(object):
         self.value = None
         self.ack_option = ack_option
         self.state = INACTIVE
+        # values requested and not yet answered, requests can be pipelined
+        self._requested = collections.deque()
+        # number of answers still expected for requests that timed out
+        self._expired = 0
 
     def __repr__(self):
         """String for debug outputs."""
@@ -330,6 +336,7 @@ class TelnetSubnegotiation(object):
         """
         self.value = value
         self.state = REQUESTED
+        self._requested.append(value)
         self.connection.rfc2217_send_subnegotiation(self.option, self.value)
         if self.connection.logger:
             self.connection.logger.debug("SB Requesting {} -> {!r}".format(self.name, self.value))
@@ -351,24 +358,40 @@ class TelnetSubnegotiation(object):
         can also throw a value error when the answer from the server does not
         match the value sent.
         """
-        timeout_timer = Timeout(timeout)
-        while not timeout_timer.expired():
-            time.sleep(0.05)    # prevent 100% CPU load
-            if self.is_ready():
-                break
-        else:
+        if not self.connection.wait_for_negotiation(self.is_ready, Timeout(timeout)):
+            self.expire()
             raise SerialException("timeout while waiting for option {!r}".format(self.name))
 
+    def expire(self):
+        """\
+        Give up on the pending requests after a timeout. Their answers may
+        still arrive, they are skipped instead of being matched to the values
+        of later requests.
+        """
+        with self.connection._negotiation_condition:
+            self._expired += len(self._requested)
+            self._requested.clear()
+
     def check_answer(self, suboption):
         """\
         Check an incoming subnegotiation block. The parameter already has
         cut off the header like sub option number and com port option value.
+        When several requests are pending, the answers arrive in order and
+        the option is active when all of them are acknowledged.
         """
-        if self.value == suboption[:len(self.value)]:
-            self.state = ACTIVE
-        else:
-            # error propagation done in is_ready
-            self.state = REALLY_INACTIVE
+        with self.connection._negotiation_condition:
+            if self._expired:
+                # late answer to a request that timed out
+                self._expired -= 1
+                if self.connection.logger:
+                    self.connection.logger.debug("SB Answer {} -> {!r} (late, ignored)".format(self.name, suboption))
+                return
+            value = self._requested.popleft() if self._requested else self.value
+            if value != suboption[:len(value)]:
+                # error propagation done in is_ready
+                self.state = REALLY_INACTIVE
+            elif not self._requested and self.state != REALLY_INACTIVE:
+                self.state = ACTIVE
         if self.connection.logger:
             self.connection.logger.debug("SB Answer {} -> {!r} -> {}".format(self.name, suboption, self.state))
 
@@ -395,6 +418,11 @@ class Serial(SerialBase):
         self._rfc2217_port_settings = None
         self._rfc2217_options = None
         self._read_buffer = None
+        self._read_condition = threading.Condition()
+        # notified when a negotiation or subnegotiation is received
+        self._negotiation_condition = threading.Condition()
+        self._pipeline = None
+        self._pipeline_items = None
         super(Serial, self).__init__(*args, **kwargs)  # must be last call in case of auto-open
 
     def open(self):
@@ -417,9 +445,9 @@ class Serial(SerialBase):
             self._socket = None
             raise SerialException("Could not open port {}: {}".format(self.portstr, msg))
 
-        # use a thread save queue as buffer. it also simplifies implementing
-        # the read timeout
-        self._read_buffer = Queue.Queue()
+        # received data is stored in a byte buffer, the condition is notified
+        # when data is added or the reader thread terminates
+        self._read_buffer = bytearray()
         # to ensure that user writes does not interfere with internal
         # telnet/rfc2217 options establish a lock
         self._write_lock = threading.Lock()
@@ -465,31 +493,42 @@ class Serial(SerialBase):
         self._thread.start()
 
         try:    # must clean-up if open fails
-            # negotiate Telnet/RFC 2217 -> send initial requests
-            for option in self._telnet_options:
-                if option.state is REQUESTED:
-                    self.telnet_send_option(option.send_yes, option.option)
+            # negotiate Telnet/RFC 2217 -> send initial requests, all at once
+            self._start_pipeline()
+            try:
+                for option in self._telnet_options:
+                    if option.state is REQUESTED:
+                        self.telnet_send_option(option.send_yes, option.option)
+            finally:
+                self._send_pipeline()
             # now wait until important options are negotiated
-            timeout = Timeout(self._network_timeout)
-            while not timeout.expired():
-                time.sleep(0.05)    # prevent 100% CPU load
-                if sum(o.active for o in mandadory_options) == sum(o.state != INACTIVE for o in mandadory_options):
-                    break
-            else:
+            if not self.wait_for_negotiation(
+                    lambda: sum(o.active for o in mandadory_options) == sum(
+                        o.state != INACTIVE for o in mandadory_options),
+                    Timeout(self._network_timeout)):
                 raise SerialException(
                     "Remote does not seem to support RFC2217 or BINARY mode {!r}".format(mandadory_options))
             if self.logger:
                 self.logger.info("Negotiated options: {}".format(self._telnet_options))
 
-            # fine, go on, set RFC 2271 specific things
-            self._reconfigure_port()
-            # all things set up get, now a clean start
-            if not self._dsrdtr:
-                self._update_dtr_state()
-            if not self._rtscts:
-                self._update_rts_state()
-            self.reset_input_buffer()
-            self.reset_output_buffer()
+            # fine, go on, set RFC 2271 specific things. the settings, the
+            # control lines and the purge requests (a clean start) are sent
+            # with one write and acknowledged together
+            self._start_pipeline()
+            try:
+                self._request_port_settings()
+                if not self._dsrdtr:
+                    self._update_dtr_state()
+                if not self._rtscts:
+                    self._update_rts_state()
+                self.rfc2217_send_purge(PURGE_RECEIVE_BUFFER)
+                self.rfc2217_send_purge(PURGE_TRANSMIT_BUFFER)
+            finally:
+                items = self._send_pipeline()
+            self._wait_for_answers(items)
+            del self._read_ahead[:]
+            with self._read_condition:
+                del self._read_buffer[:]
         except:
             self.close()
             raise
@@ -502,42 +541,56 @@ class Serial(SerialBase):
         # if self._timeout != 0 and self._interCharTimeout is not None:
             # XXX
 
+        # Setup the connection
+        # to get good performance, all parameter changes are sent with one
+        # write and then the answers are awaited together
+        self._start_pipeline()
+        try:
+            self._request_port_settings()
+        finally:
+            items = self._send_pipeline()
+        self._wait_for_answers(items)
+
+    def _request_port_settings(self):
+        """Send the settings and the flow control, call with pipeline started"""
+        # checked here as open() does not call _reconfigure_port()
         if self._write_timeout is not None:
             raise NotImplementedError('write_timeout is currently not supported')
             # XXX
 
-        # Setup the connection
-        # to get good performance, all parameter changes are sent first...
         if not 0 < self._baudrate < 2 ** 32:
             raise ValueError("invalid baudrate: {!r}".format(self._baudrate))
+        if self._rtscts and self._xonxoff:
+            raise ValueError('xonxoff and rtscts together are not supported')
         self._rfc2217_port_settings['baudrate'].set(struct.pack(b'!I', self._baudrate))
         self._rfc2217_port_settings['datasize'].set(struct.pack(b'!B', self._bytesize))
         self._rfc2217_port_settings['parity'].set(struct.pack(b'!B', RFC2217_PARITY_MAP[self._parity]))
         self._rfc2217_port_settings['stopsize'].set(struct.pack(b'!B', RFC2217_STOPBIT_MAP[self._stopbits]))
+        self._pipeline_items.extend(self._rfc2217_port_settings.values())
+        if self._rtscts:
+            self.rfc2217_set_control(SET_CONTROL_USE_HW_FLOW_CONTROL)
+        elif self._xonxoff:
+            self.rfc2217_set_control(SET_CONTROL_USE_SW_FLOW_CONTROL)
+        else:
+            self.rfc2217_set_control(SET_CONTROL_USE_NO_FLOW_CONTROL)
 
-        # and now wait until parameters are active
-        items = self._rfc2217_port_settings.values()
+    def _wait_for_answers(self, items):
+        """Wait until all subnegotiations in items are acknowledged, one timeout for all"""
         if self.logger:
             self.logger.debug("Negotiating settings: {}".format(items))
-        timeout = Timeout(self._network_timeout)
-        while not timeout.expired():
-            time.sleep(0.05)    # prevent 100% CPU load
-            if sum(o.active for o in items) == len(items):
-                break
-        else:
+        # done when all are acknowledged, or as soon as one is rejected
+        if not self.wait_for_negotiation(
+                lambda: any(item.state == REALLY_INACTIVE for item in items) or all(
+                    item.state == ACTIVE for item in items),
+                Timeout(self._network_timeout)):
+            for item in items:
+                item.expire()
             raise SerialException("Remote does not accept parameter change (RFC2217): {!r}".format(items))
+        for item in items:
+            item.is_ready()     # raises ValueError if rejected
         if self.logger:
             self.logger.info("Negotiated settings: {}".format(items))
 
-        if self._rtscts and self._xonxoff:
-            raise ValueError('xonxoff and rtscts together are not supported')
-        elif self._rtscts:
-            self.rfc2217_set_control(SET_CONTROL_USE_HW_FLOW_CONTROL)
-        elif self._xonxoff:
-            self.rfc2217_set_control(SET_CONTROL_USE_SW_FLOW_CONTROL)
-        else:
-            self.rfc2217_set_control(SET_CONTROL_USE_NO_FLOW_CONTROL)
-
     def close(self):
         """Close port"""
         self.is_open = False
@@ -597,7 +650,7 @@ class Serial(SerialBase):
         """Return the number of bytes currently in the input buffer."""
         if not self.is_open:
             raise portNotOpenError
-        return self._read_buffer.qsize()
+        return len(self._read_buffer) + len(self._read_ahead)
 
     def read(self, size=1):
         """\
@@ -607,17 +660,20 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise portNotOpenError
-        data = bytearray()
-        try:
-            timeout = Timeout(self._timeout)
+        data = self._pop_read_ahead(size)
+        timeout = Timeout(self._timeout)
+        with self._read_condition:
             while len(data) < size:
-                if self._thread is None:
+                if self._read_buffer:
+                    n = size - len(data)
+                    data += self._read_buffer[:n]
+                    del self._read_buffer[:n]
+                elif self._thread is None:
                     raise SerialException('connection failed (reader thread died)')
-                data += self._read_buffer.get(True, timeout.time_left())
-                if timeout.expired():
+                elif timeout.expired():
                     break
-        except Queue.Empty:  # -> timeout
-            pass
+                else:
+                    self._read_condition.wait(timeout.time_left())
         return bytes(data)
 
     def write(self, data):
@@ -641,8 +697,9 @@ class Serial(SerialBase):
             raise portNotOpenError
         self.rfc2217_send_purge(PURGE_RECEIVE_BUFFER)
         # empty read buffer
-        while self._read_buffer.qsize():
-            self._read_buffer.get(False)
+        del self._read_ahead[:]
+        with self._read_condition:
+            del self._read_buffer[:]
 
     def reset_output_buffer(self):
         """\
@@ -741,26 +798,33 @@ class Serial(SerialBase):
                     break
                 if not data:
                     break  # lost connection
-                for byte in iterbytes(data):
+                received = bytearray()
+                pos = 0
+                while pos < len(data):
                     if mode == M_NORMAL:
-                        # interpret as command or as data
-                        if byte == IAC:
-                            mode = M_IAC_SEEN
+                        # copy everything up to the next IAC as a whole, as
+                        # data or to the sub option buffer depending on state
+                        iac = data.find(IAC, pos)
+                        end = len(data) if iac < 0 else iac
+                        if suboption is not None:
+                            suboption += data[pos:end]
                         else:
-                            # store data in read buffer or sub option buffer
-                            # depending on state
-                            if suboption is not None:
-                                suboption += byte
-                            else:
-                                self._read_buffer.put(byte)
-                    elif mode == M_IAC_SEEN:
+                            received += data[pos:end]
+                        if iac < 0:
+                            break
+                        mode = M_IAC_SEEN
+                        pos = iac + 1
+                        continue
+                    byte = data[pos:pos + 1]
+                    pos += 1
+                    if mode == M_IAC_SEEN:
                         if byte == IAC:
                             # interpret as command doubled -> insert character
                             # itself
                             if suboption is not None:
                                 suboption += IAC
                             else:
-                                self._read_buffer.put(IAC)
+                                received += IAC
                             mode = M_NORMAL
                         elif byte == SB:
                             # sub option start
@@ -769,6 +833,7 @@ class Serial(SerialBase):
                         elif byte == SE:
                             # sub option end -> process it now
                             self._telnet_process_subnegotiation(bytes(suboption))
+                            self._notify_negotiation()
                             suboption = None
                             mode = M_NORMAL
                         elif byte in (DO, DONT, WILL, WONT):
@@ -781,12 +846,37 @@ class Serial(SerialBase):
                             mode = M_NORMAL
                     elif mode == M_NEGOTIATE:  # DO, DONT, WILL, WONT was received, option now following
                         self._telnet_negotiate_option(telnet_command, byte)
+                        self._notify_negotiation()
                         mode = M_NORMAL
+                if received:
+                    with self._read_condition:
+                        self._read_buffer += received
+                        self._read_condition.notify_all()
         finally:
-            self._thread = None
+            with self._read_condition:
+                self._thread = None
+                self._read_condition.notify_all()
+            self._notify_negotiation()
             if self.logger:
                 self.logger.debug("read thread terminated")
 
+    def _notify_negotiation(self):
+        with self._negotiation_condition:
+            self._negotiation_condition.notify_all()
+
+    def wait_for_negotiation(self, predicate, timeout):
+        """\
+        Wait until predicate() is true, it is checked each time a telnet
+        option or subnegotiation is received. timeout is a Timeout object.
+        Returns False on timeout or when the connection is lost.
+        """
+        with self._negotiation_condition:
+            while not predicate():
+                if timeout.expired() or self._thread is None:
+                    return False
+                self._negotiation_condition.wait(timeout.time_left())
+        return True
+
     # - incoming telnet commands and options
 
     def _telnet_process_command(self, command):
@@ -849,7 +939,36 @@ class Serial(SerialBase):
     def _internal_raw_write(self, data):
         """internal socket write with no data escaping. used to send telnet stuff."""
         with self._write_lock:
-            self._socket.sendall(data)
+            if self._pipeline is not None:
+                self._pipeline += data
+            else:
+                self._socket.sendall(data)
+
+    def _start_pipeline(self):
+        """\
+        Collect telnet commands instead of sending each one, and the
+        subnegotiations to wait for instead of waiting for each answer, until
+        _send_pipeline() is called.
+        """
+        with self._write_lock:
+            self._pipeline = bytearray()
+            self._pipeline_items = []
+
+    def _send_pipeline(self):
+        """Send the collected commands with one write, returns the subnegotiations to wait for"""
+        with self._write_lock:
+            data, self._pipeline = self._pipeline, None
+            items, self._pipeline_items = self._pipeline_items, None
+            if data:
+                self._socket.sendall(data)
+        return items
+
+    def _wait_for_answer(self, item):
+        """Wait for the acknowledge from the server, or collect it when pipelining"""
+        if self._pipeline_items is not None:
+            self._pipeline_items.append(item)
+        else:
+            item.wait(self._network_timeout)
 
     def telnet_send_option(self, action, option):
         """Send DO, DONT, WILL, WONT."""
@@ -867,7 +986,7 @@ class Serial(SerialBase):
         """
         item = self._rfc2217_options['purge']
         item.set(value)  # transmit desired purge type
-        item.wait(self._network_timeout)  # wait for acknowledge from the server
+        self._wait_for_answer(item)  # wait for acknowledge from the server
 
     def rfc2217_set_control(self, value):
         """transmit change of control line to remote"""
@@ -877,9 +996,10 @@ class Serial(SerialBase):
             # answers are ignored when option is set. compatibility mode for
             # servers that answer, but not the expected one... (or no answer
             # at all) i.e. sredird
+            item._requested.clear()  # so the answers are not matched to requests
             time.sleep(0.1)  # this helps getting the unit tests passed
         else:
-            item.wait(self._network_timeout)  # wait for acknowledge from the server
+            self._wait_for_answer(item)  # wait for acknowledge from the server
 
     def rfc2217_flow_server_ready(self):
         """\
@@ -902,14 +1022,10 @@ class Serial(SerialBase):
                 self.logger.debug('polling modem state')
             # when it is older, request an update
             self.rfc2217_send_subnegotiation(NOTIFY_MODEMSTATE)
-            timeout = Timeout(self._network_timeout)
-            while not timeout.expired():
-                time.sleep(0.05)    # prevent 100% CPU load
-                # when expiration time is updated, it means that there is a new
-                # value
-                if not self._modemstate_timeout.expired():
-                    break
-            else:
+            # when expiration time is updated, it means that there is a new
+            # value
+            if not self.wait_for_negotiation(
+                    lambda: not self._modemstate_timeout.expired(), Timeout(self._network_timeout)):
                 if self.logger:
                     self.logger.warning('poll for modem state failed')
             # even when there is a timeout, do not generate an error just
@@ -1000,18 +1116,21 @@ class PortManager(object):
         self.connection.write(IAC + SB + COM_PORT_OPTION + option + value + IAC + SE)
 
     # - check modem lines, needs to be called periodically from user to
-    # establish polling
+    # establish polling, or with the results of serial.wait_modem_change()
 
-    def check_modem_lines(self, force_notification=False):
+    def check_modem_lines(self, force_notification=False, modem_status=None):
         """\
         read control lines from serial port and compare the last value sent to remote.
-        send updates on changes.
+        send updates on changes. modem_status can be given when it is already
+        known (e.g. from wait_modem_change()), the port is not read then.
         """
+        if modem_status is None:
+            modem_status = self.serial.modem_status
         modemstate = (
-            (self.serial.cts and MODEMSTATE_MASK_CTS) |
-            (self.serial.dsr and MODEMSTATE_MASK_DSR) |
-            (self.serial.ri and MODEMSTATE_MASK_RI) |
-            (self.serial.cd and MODEMSTATE_MASK_CD))
+            (modem_status.cts and MODEMSTATE_MASK_CTS) |
+            (modem_status.dsr and MODEMSTATE_MASK_DSR) |
+            (modem_status.ri and MODEMSTATE_MASK_RI) |
+            (modem_status.cd and MODEMSTATE_MASK_CD))
         # check what has changed
         deltas = modemstate ^ (self.last_modemstate or 0)  # when last is None -> 0
         if deltas & MODEMSTATE_MASK_CTS:
@@ -1044,45 +1163,48 @@ class PortManager(object):
         properly escaped, so that no IAC character in the data stream messes up
         the Telnet state machine in the server.
 
-        socket.sendall(escape(data))
+        socket.sendall(b''.join(escape(data)))
+
+        The escaped data is yielded as one chunk.
         """
-        for byte in iterbytes(data):
-            if byte == IAC:
-                yield IAC
-                yield IAC
-            else:
-                yield byte
+        yield to_bytes(data).replace(IAC, IAC_DOUBLED)
 
     # - incoming data filter
 
     def filter(self, data):
         """\
         Handle a bunch of incoming bytes. This is a generator. It will yield
-        all characters not of interest for Telnet/RFC 2217.
+        all data not of interest for Telnet/RFC 2217, in chunks (runs of data
+        between Telnet commands).
 
         The idea is that the reader thread pushes data from the socket through
         this filter:
 
-        for byte in filter(socket.recv(1024)):
-            # do things like CR/LF conversion/whatever
-            # and write data to the serial port
-            serial.write(byte)
+        serial.write(b''.join(filter(socket.recv(1024))))
 
         (socket error handling code left as exercise for the reader)
         """
-        for byte in iterbytes(data):
+        data = to_bytes(data)
+        pos = 0
+        while pos < len(data):
             if self.mode == M_NORMAL:
-                # interpret as command or as data
-                if byte == IAC:
-                    self.mode = M_IAC_SEEN
-                else:
-                    # store data in sub option buffer or pass it to our
-                    # consumer depending on state
+                # pass everything up to the next IAC as a whole to our
+                # consumer or store it in sub option buffer depending on state
+                iac = data.find(IAC, pos)
+                end = len(data) if iac < 0 else iac
+                if end > pos:
                     if self.suboption is not None:
-                        self.suboption += byte
+                        self.suboption += data[pos:end]
                     else:
-                        yield byte
-            elif self.mode == M_IAC_SEEN:
+                        yield data[pos:end]
+                if iac < 0:
+                    break
+                self.mode = M_IAC_SEEN
+                pos = iac + 1
+                continue
+            byte = data[pos:pos + 1]
+            pos += 1
+            if self.mode == M_IAC_SEEN:
                 if byte == IAC:
                     # interpret as command doubled -> insert character
                     # itself
@@ -1332,6 +1454,306 @@ class PortManager(object):
                 self.logger.warning("unknown subnegotiation: {!r}".format(suboption))
 
 
+class _ServedPort(object):
+    """\
+    State of one serial port served by Server: the listening socket, the
+    connected client (if any), its PortManager and the output buffers in both
+    directions.
+    """
+
+    def __init__(self, server, serial_port, listen_socket):
+        self.server = server
+        self.serial = serial_port
+        self.listen_socket = listen_socket
+        self.client = None
+        self.port_manager = None
+        self.to_network = bytearray()
+        self.to_serial = bytearray()
+
+    def write(self, data):
+        """Connection interface for the PortManager: queue data for the client"""
+        self.to_network += data
+        self.server._flush_network(self)
+
+
+class Server(object):
+    """\
+    RFC 2217 server for any number of serial ports, running a single selector
+    loop. Each serial port is offered on its own TCP port and serves one
+    client at a time, further connection attempts are rejected while a client
+    is connected.
+
+    The modem lines of all ports with a client are polled every
+    poll_interval seconds and changes are sent to the clients. With
+    poll_interval set to None, a thread per port waits for line changes
+    (serial.wait_modem_change()) instead.
+
+    Only ports that provide fileno() (i.e. POSIX) are supported.
+    """
+
+    READ_SIZE = 4096
+    # stop reading from one side while the other one has this much pending
+    HIGH_WATER = 64 * 1024
+
+    def __init__(self, poll_interval=1, logger=None):
+        if selectors is None:
+            raise NotImplementedError('selectors module required')
+        self.poll_interval = poll_interval
+        self.logger = logger
+        self.alive = False
+        self._selector = selectors.DefaultSelector()
+        self._ports = []
+        self._events = {}   # registered fileobj -> events
+        self._modem_changes = collections.deque()   # (port, status) from watchers
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, (None, self._wakeup_r))
+
+    def add_port(self, serial_port, address):
+        """\
+        Serve an open serial port on the given (host, port) address. The
+        serial port is switched to non-blocking mode. Not thread safe, call
+        before run().
+        """
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listen_socket.bind(address)
+        listen_socket.listen(1)
+        listen_socket.setblocking(False)
+        serial_port.timeout = 0
+        serial_port.write_timeout = 0
+        port = _ServedPort(self, serial_port, listen_socket)
+        self._ports.append(port)
+        self._set_events(port, listen_socket, selectors.EVENT_READ)
+        if self.poll_interval is None:
+            watcher = threading.Thread(
+                target=self._watch_modem_lines, args=(port,),
+                name='rfc2217 modem line watcher for {}'.format(serial_port.name))
+            watcher.daemon = True
+            watcher.start()
+        if self.logger:
+            self.logger.info("serving {} on {}".format(serial_port.name, listen_socket.getsockname()))
+        return port
+
+    def _set_events(self, port, fileobj, events):
+        """Register, modify or unregister fileobj in the selector"""
+        old = self._events.get(fileobj, 0)
+        if events == old:
+            return
+        if not events:
+            self._selector.unregister(fileobj)
+            del self._events[fileobj]
+        elif not old:
+            self._selector.register(fileobj, events, (port, fileobj))
+            self._events[fileobj] = events
+        else:
+            self._selector.modify(fileobj, events, (port, fileobj))
+            self._events[fileobj] = events
+
+    def _update_events(self, port):
+        """Compute what to wait for, depending on the buffer states"""
+        if port.client is None:
+            return
+        client_events = serial_events = 0
+        # backpressure: only read from one side when the other side keeps up
+        if len(port.to_serial) < self.HIGH_WATER:
+            client_events |= selectors.EVENT_READ
+        if len(port.to_network) < self.HIGH_WATER:
+            serial_events |= selectors.EVENT_READ
+        if port.to_network:
+            client_events |= selectors.EVENT_WRITE
+        if port.to_serial:
+            serial_events |= selectors.EVENT_WRITE
+        self._set_events(port, port.client, client_events)
+        self._set_events(port, port.serial, serial_events)
+
+    #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
+
+    def _accept(self, port):
+        try:
+            client, address = port.listen_socket.accept()
+        except socket.error:
+            return
+        if port.client is not None:
+            if self.logger:
+                self.logger.warning("{}: rejecting connection from {}, port in use".format(port.serial.name, address))
+            client.close()
+            return
+        if self.logger:
+            self.logger.info("{}: connected by {}".format(port.serial.name, address))
+        client.setblocking(False)
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        port.client = client
+        port.port_manager = PortManager(port.serial, port, logger=self.logger)
+        self._update_events(port)
+
+    def _disconnect(self, port, reason=None):
+        if port.client is None:
+            return
+        if self.logger:
+            self.logger.info("{}: disconnected ({})".format(port.serial.name, reason))
+        self._set_events(port, port.client, 0)
+        self._set_events(port, port.serial, 0)
+        port.client.close()
+        port.client = None
+        port.port_manager = None
+        del port.to_network[:]
+        del port.to_serial[:]
+        # restore default settings for the next client
+        try:
+            port.serial.rts = True
+            port.serial.dtr = True
+        except (IOError, OSError, SerialException):
+            pass
+
+    def _read_network(self, port):
+        try:
+            data = port.client.recv(self.READ_SIZE)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self._disconnect(port, e)
+            return
+        if not data:
+            self._disconnect(port, 'connection closed')
+            return
+        try:
+            data = b''.join(port.port_manager.filter(data))
+        except (IOError, OSError, SerialException) as e:
+            # applying settings failed, only this client is affected
+            self._disconnect(port, e)
+            return
+        if port.client is not None:     # answers may have failed to send
+            port.to_serial += data
+            self._flush_serial(port)
+
+    def _flush_network(self, port):
+        if port.client is None:
+            return
+        if port.to_network:
+            try:
+                n = port.client.send(port.to_network)
+            except socket.error as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    self._disconnect(port, e)
+                    return
+            else:
+                del port.to_network[:n]
+        self._update_events(port)
+
+    def _read_serial(self, port):
+        try:
+            data = port.serial.read(self.READ_SIZE)
+        except SerialException as e:
+            self._disconnect(port, e)
+            return
+        if data:
+            port.to_network += b''.join(port.port_manager.escape(data))
+            self._flush_network(port)
+
+    def _flush_serial(self, port):
+        if port.client is None:
+            return
+        if port.to_serial:
+            try:
+                n = port.serial.write(port.to_serial)
+            except SerialException as e:
+                self._disconnect(port, e)
+                return
+            del port.to_serial[:n]
+        self._update_events(port)
+
+    def _watch_modem_lines(self, port):
+        """Thread: pass modem line changes of one port to the loop"""
+        while port in self._ports:
+            try:
+                status = port.serial.wait_modem_change(timeout=1)
+            except (IOError, OSError):
+                # port without modem lines (SerialException is an IOError)
+                break
+            if status is not None:
+                self._modem_changes.append((port, status))
+                try:
+                    self._wakeup_w.send(b'x')
+                except socket.error:
+                    break   # server closed
+
+    def _notify_modem_changes(self):
+        while self._modem_changes:
+            port, status = self._modem_changes.popleft()
+            if port.port_manager is not None:
+                port.port_manager.check_modem_lines(modem_status=status)
+
+    def _check_modem_lines(self):
+        for port in self._ports:
+            if port.port_manager is not None:
+                try:
+                    port.port_manager.check_modem_lines()
+                except (IOError, OSError, SerialException) as e:
+                    self._disconnect(port, e)
+
+    #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
+
+    def _dispatch(self, port, fileobj, events):
+        if fileobj is port.listen_socket:
+            self._accept(port)
+        elif fileobj is port.client:
+            if events & selectors.EVENT_READ:
+                self._read_network(port)
+            if events & selectors.EVENT_WRITE:
+                self._flush_network(port)
+        elif fileobj is port.serial:
+            if events & selectors.EVENT_READ:
+                self._read_serial(port)
+            if events & selectors.EVENT_WRITE and port.client is not None:
+                self._flush_serial(port)
+
+    def run(self):
+        """Serve all ports until stop() is called"""
+        self.alive = True
+        poll_timer = Timeout(self.poll_interval)
+        while self.alive:
+            for key, events in self._selector.select(poll_timer.time_left()):
+                port, fileobj = key.data
+                if port is None:
+                    try:
+                        self._wakeup_r.recv(1024)
+                    except socket.error:
+                        pass
+                    self._notify_modem_changes()
+                    continue
+                if fileobj not in self._events:
+                    # unregistered by an earlier event of this batch, e.g.
+                    # the serial port of a client that just disconnected
+                    continue
+                try:
+                    self._dispatch(port, fileobj, events)
+                except Exception as e:
+                    # an error of one port must not stop serving the others
+                    if self.logger:
+                        self.logger.exception("{}: unexpected error".format(port.serial.name))
+                    self._disconnect(port, e)
+            if poll_timer.expired():
+                self._check_modem_lines()
+                poll_timer.restart(self.poll_interval)
+
+    def stop(self):
+        """Thread safe: let run() return"""
+        self.alive = False
+        self._wakeup_w.send(b'x')
+
+    def close(self):
+        """Disconnect all clients and close the listening sockets"""
+        for port in self._ports:
+            self._disconnect(port, 'server closed')
+            self._set_events(port, port.listen_socket, 0)
+            port.listen_socket.close()
+        self._ports = []
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+
 # simple client test
 if __name__ == '__main__':
     import sys
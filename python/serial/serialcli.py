@@ -147,7 +147,7 @@ class Serial(SerialBase):
         """Return the number of characters currently in the input buffer."""
         if not self.is_open:
             raise portNotOpenError
-        return self._port_handle.BytesToRead
+        return self._port_handle.BytesToRead + len(self._read_ahead)
 
     def read(self, size=1):
         """\
@@ -159,7 +159,8 @@ class Serial(SerialBase):
             raise portNotOpenError
         # must use single byte reads as this is the only way to read
         # without applying encodings
-        data = bytearray()
+        data = self._pop_read_ahead(size)
+        size -= len(data)
         while size:
             try:
                 data.append(self._port_handle.ReadByte())
@@ -187,6 +188,7 @@ class Serial(SerialBase):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise portNotOpenError
+        del self._read_ahead[:]
         self._port_handle.DiscardInBuffer()
 
     def reset_output_buffer(self):
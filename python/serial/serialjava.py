@@ -151,7 +151,7 @@ class Serial(SerialBase):
         """Return the number of characters currently in the input buffer."""
         if not self.sPort:
             raise portNotOpenError
-        return self._instream.available()
+        return self._instream.available() + len(self._read_ahead)
 
     def read(self, size=1):
         """\
@@ -161,7 +161,7 @@ class Serial(SerialBase):
         """
         if not self.sPort:
             raise portNotOpenError
-        read = bytearray()
+        read = self._pop_read_ahead(size)
         if size > 0:
             while len(read) < size:
                 x = self._instream.read()
@@ -185,6 +185,7 @@ class Serial(SerialBase):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.sPort:
             raise portNotOpenError
+        del self._read_ahead[:]
         self._instream.skip(self._instream.available())
 
     def reset_output_buffer(self):
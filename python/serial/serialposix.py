@@ -31,13 +31,16 @@ import errno
 import fcntl
 import os
 import select
+import signal
 import struct
 import sys
 import termios
+import threading
+import time
 
 import serial
-from serial.serialutil import SerialBase, SerialException, to_bytes, \
-    portNotOpenError, writeTimeoutError, Timeout
+from serial.serialutil import SerialBase, SerialException, to_buffer, \
+    portNotOpenError, writeTimeoutError, Timeout, ModemStatus
 
 
 class PlatformSpecificBase(object):
@@ -243,6 +246,75 @@ TIOCM_DTR_str = struct.pack('I', TIOCM_DTR)
 TIOCSBRK = getattr(termios, 'TIOCSBRK', 0x5427)
 TIOCCBRK = getattr(termios, 'TIOCCBRK', 0x5428)
 
+# wait for modem status line changes, Linux only
+TIOCMIWAIT = getattr(termios, 'TIOCMIWAIT', 0x545C if plat[:5] == 'linux' else None)
+TIOCM_MODEM_STATUS = TIOCM_CTS | TIOCM_DSR | TIOCM_RI | TIOCM_CD
+
+# close() sends this signal to a thread blocked in TIOCMIWAIT, the ioctl then
+# fails with EINTR. It needs a handler, a signal that is ignored or handled
+# by its default action does not interrupt the ioctl (or kills the process).
+MODEM_WAKEUP_SIGNAL = getattr(signal, 'SIGRTMAX', None)
+
+
+def _modem_wakeup(signum, frame):
+    """Handler of MODEM_WAKEUP_SIGNAL, interrupting the ioctl is all it does"""
+
+
+def modem_wakeup_available():
+    """\
+    Install the handler of MODEM_WAKEUP_SIGNAL if it is still unused. That is
+    only possible from the main thread. Returns True if threads blocked in
+    TIOCMIWAIT can be woken up.
+    """
+    if MODEM_WAKEUP_SIGNAL is None or not hasattr(signal, 'pthread_kill'):
+        return False
+    handler = signal.getsignal(MODEM_WAKEUP_SIGNAL)
+    if handler is _modem_wakeup:
+        return True
+    if handler != signal.SIG_DFL:
+        return False    # the application uses the signal
+    try:
+        signal.signal(MODEM_WAKEUP_SIGNAL, _modem_wakeup)
+    except ValueError:
+        return False    # not in the main thread
+    return True
+
+
+def modem_status_from_bits(bits):
+    """Convert the result of a TIOCMGET to a ModemStatus tuple"""
+    return ModemStatus(
+        bits & TIOCM_CTS != 0,
+        bits & TIOCM_DSR != 0,
+        bits & TIOCM_RI != 0,
+        bits & TIOCM_CD != 0)
+
+
+if hasattr(os, 'readv'):
+    def read_into(fd, buf):
+        """Read from fd directly into the writable memoryview buf"""
+        return os.readv(fd, [buf])
+else:
+    def read_into(fd, buf):
+        """Read from fd into the writable memoryview buf (copying fallback)"""
+        data = os.read(fd, len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+
+if hasattr(os, 'writev'):
+    try:
+        IOV_MAX = os.sysconf('SC_IOV_MAX')
+    except (AttributeError, ValueError, OSError):
+        IOV_MAX = 16    # minimum required by POSIX
+
+    def write_from(fd, buffers):
+        """Write from the list of memoryviews buffers, returns the number of bytes written"""
+        return os.writev(fd, buffers[:IOV_MAX])
+else:
+    def write_from(fd, buffers):
+        """Write the first of the memoryviews in buffers (fallback without writev)"""
+        return os.write(fd, buffers[0])
+
 
 class Serial(SerialBase, PlatformSpecific):
     """\
@@ -260,6 +332,8 @@ class Serial(SerialBase, PlatformSpecific):
         if self.is_open:
             raise SerialException("Port is already open.")
         self.fd = None
+        # changes are reported relative to the lines of this session
+        self._modem_status_reported = None
         # open
         try:
             self.fd = os.open(self.portstr, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
@@ -293,6 +367,16 @@ class Serial(SerialBase, PlatformSpecific):
             else:
                 raise
         self.reset_input_buffer()
+        self._modem_condition = threading.Condition()
+        self._modem_thread = None
+        self._modem_use_tiocmiwait = False
+        self._modem_status = None
+        self._modem_error = None
+        self._modem_status_reported = None
+        if TIOCMIWAIT is not None:
+            # ports are usually opened in the main thread, the only one that
+            # can install the signal handler for wait_modem_change()
+            modem_wakeup_available()
         self.pipe_abort_read_r, self.pipe_abort_read_w = os.pipe()
         self.pipe_abort_write_r, self.pipe_abort_write_w = os.pipe()
         fcntl.fcntl(self.pipe_abort_read_r, fcntl.F_SETFL, os.O_NONBLOCK)
@@ -447,6 +531,21 @@ class Serial(SerialBase, PlatformSpecific):
     def close(self):
         """Close port"""
         if self.is_open:
+            # let the modem line helper thread exit before the file
+            # descriptor is closed (and possibly reused)
+            with self._modem_condition:
+                watcher, self._modem_thread = self._modem_thread, None
+                self._modem_condition.notify_all()
+            if watcher is not None and watcher is not threading.current_thread():
+                # it may be blocked in TIOCMIWAIT, or about to enter it when
+                # the signal arrives, so repeat until it has exited
+                while watcher.is_alive():
+                    if self._modem_use_tiocmiwait:
+                        try:
+                            signal.pthread_kill(watcher.ident, MODEM_WAKEUP_SIGNAL)
+                        except OSError:
+                            pass    # exited in the meantime
+                    watcher.join(self.modem_poll_interval)
             if self.fd is not None:
                 os.close(self.fd)
                 self.fd = None
@@ -465,9 +564,8 @@ class Serial(SerialBase, PlatformSpecific):
         """Return the number of bytes currently in the input buffer."""
         #~ s = fcntl.ioctl(self.fd, termios.FIONREAD, TIOCM_zero_str)
         s = fcntl.ioctl(self.fd, TIOCINQ, TIOCM_zero_str)
-        return struct.unpack('I', s)[0]
+        return struct.unpack('I', s)[0] + len(self._read_ahead)
 
-    # select based implementation, proved to work on many systems
     def read(self, size=1):
         """\
         Read size bytes from the serial port. If a timeout is set it may
@@ -476,9 +574,27 @@ class Serial(SerialBase, PlatformSpecific):
         """
         if not self.is_open:
             raise portNotOpenError
-        read = bytearray()
-        timeout = Timeout(self._timeout)
-        while len(read) < size:
+        return self._read_growing(size)
+
+    def readinto(self, b):
+        """\
+        Read bytes into a pre-allocated, writable buffer and return the number
+        of bytes read. The data is read directly into the buffer, no
+        intermediate objects are created. If a timeout is set it may read less
+        bytes than fit into the buffer.
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        return self._readinto(memoryview(b).cast('B'), Timeout(self._timeout))
+
+    # select based implementation, proved to work on many systems
+    def _readinto(self, buf, timeout):
+        """Read into the byte memoryview buf until it is full or timeout (a Timeout) expires"""
+        size = len(buf)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        while n < size:
             try:
                 ready, _, _ = select.select([self.fd, self.pipe_abort_read_r], [], [], timeout.time_left())
                 if self.pipe_abort_read_r in ready:
@@ -490,17 +606,17 @@ class Serial(SerialBase, PlatformSpecific):
                 # there is nothing to read.
                 if not ready:
                     break   # timeout
-                buf = os.read(self.fd, size - len(read))
+                count = read_into(self.fd, buf[n:])
                 # read should always return some data as select reported it was
                 # ready to read when we get to this point.
-                if not buf:
+                if not count:
                     # Disconnected devices, at least on Linux, show the
                     # behavior that they are always ready to read immediately
                     # but reading returns nothing.
                     raise SerialException(
                         'device reports readiness to read but returned no data '
                         '(device disconnected or multiple access on port?)')
-                read.extend(buf)
+                n += count
             except OSError as e:
                 # this is for Python 3.x where select.error is a subclass of
                 # OSError ignore BlockingIOErrors and EINTR. other errors are shown
@@ -515,7 +631,74 @@ class Serial(SerialBase, PlatformSpecific):
                     raise SerialException('read failed: {}'.format(e))
             if timeout.expired():
                 break
-        return bytes(read)
+        return n
+
+    def _wait_readable(self, timeout):
+        """\
+        Wait until the port is readable, at most timeout seconds (None: no
+        limit). Returns False on timeout or if cancel_read() was called.
+        """
+        while True:
+            try:
+                ready, _, _ = select.select([self.fd, self.pipe_abort_read_r], [], [], timeout)
+            except select.error as e:
+                # select.error is OSError on Python 3
+                if e.args[0] != errno.EINTR:
+                    raise SerialException('read failed: {}'.format(e))
+                continue
+            if self.pipe_abort_read_r in ready:
+                os.read(self.pipe_abort_read_r, 1000)
+                return False
+            return bool(ready)
+
+    def _wait_writable(self, timeout):
+        """\
+        Wait until the port is writable, at most timeout seconds (None: no
+        limit). Returns False if cancel_write() was called, raises
+        SerialTimeoutException on timeout.
+        """
+        abort, ready, _ = select.select([self.pipe_abort_write_r], [self.fd], [], timeout)
+        if abort:
+            os.read(self.pipe_abort_write_r, 1000)
+            return False
+        if not ready:
+            raise writeTimeoutError
+        return True
+
+    def read_some(self, size=4096, gap=None):
+        """\
+        Wait until data is available (at most timeout seconds) and return what
+        has arrived, up to size bytes, read with one system call. If gap is
+        given, reading continues as long as more bytes arrive within gap
+        seconds, so that a burst that is still being received is returned in
+        one piece. Returns an empty bytes object on timeout.
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        buf = bytearray(size)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        if not n and not self._wait_readable(self._timeout):
+            return b''
+        view = memoryview(buf)
+        while n < size:
+            try:
+                count = read_into(self.fd, view[n:])
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
+                    raise SerialException('read failed: {}'.format(e))
+                count = None    # read-ahead data only, or a spurious wakeup
+            if count == 0:
+                # readiness without data, see readinto()
+                raise SerialException(
+                    'device reports readiness to read but returned no data '
+                    '(device disconnected or multiple access on port?)')
+            if count:
+                n += count
+            if n >= size or gap is None or not self._wait_readable(gap):
+                break
+        return bytes(view[:n])
 
     def cancel_read(self):
         if self.is_open:
@@ -526,41 +709,63 @@ class Serial(SerialBase, PlatformSpecific):
             os.write(self.pipe_abort_write_w, b"x")
 
     def write(self, data):
-        """Output the given byte string over the serial port."""
+        """\
+        Output the given byte string over the serial port. Objects that
+        support the buffer protocol (bytes, bytearray, memoryview, ...) are
+        not copied.
+        """
+        return self._write_buffers((data,))
+
+    def write_many(self, buffers):
+        """\
+        Output several buffers, e.g. header, payload and checksum of a packet,
+        as if they were concatenated. They are passed to os.writev() without
+        copying. Returns the number of bytes written, timeouts and
+        cancel_write() are handled as for write().
+        """
+        return self._write_buffers(buffers)
+
+    def _write_buffers(self, buffers):
         if not self.is_open:
             raise portNotOpenError
-        d = to_bytes(data)
-        tx_len = length = len(d)
+        views = [view for view in (to_buffer(data) for data in buffers) if len(view)]
+        try:
+            return self._write_views(views)
+        finally:
+            # the views of the caller's buffers must not outlive the call, also
+            # not in the traceback of an exception: resizing a bytearray
+            # fails while it is exported
+            for view in views:
+                view.release()
+            del views[:]
+
+    def _write_views(self, views):
+        """Write the list of memoryviews views, it is modified"""
+        written = 0
         timeout = Timeout(self._write_timeout)
-        while tx_len > 0:
+        while views:
             try:
-                n = os.write(self.fd, d)
+                n = write_from(self.fd, views)
+                written += n
+                # skip what was written, partially written buffers are
+                # continued with a view at the new offset
+                while n:
+                    if n >= len(views[0]):
+                        n -= len(views.pop(0))
+                    else:
+                        views[0] = views[0][n:]
+                        n = 0
+                if not views:
+                    break
                 if timeout.is_non_blocking:
                     # Zero timeout indicates non-blocking - simply return the
                     # number of bytes of data actually written
-                    return n
-                elif not timeout.is_infinite:
-                    # when timeout is set, use select to wait for being ready
-                    # with the time left as timeout
-                    if timeout.expired():
-                        raise writeTimeoutError
-                    abort, ready, _ = select.select([self.pipe_abort_write_r], [self.fd], [], timeout.time_left())
-                    if abort:
-                        os.read(self.pipe_abort_write_r, 1000)
-                        break
-                    if not ready:
-                        raise writeTimeoutError
-                else:
-                    assert timeout.time_left() is None
-                    # wait for write operation
-                    abort, ready, _ = select.select([self.pipe_abort_write_r], [self.fd], [], None)
-                    if abort:
-                        os.read(self.pipe_abort_write_r, 1)
-                        break
-                    if not ready:
-                        raise SerialException('write failed (select)')
-                d = d[n:]
-                tx_len -= n
+                    return written
+                if timeout.expired():
+                    raise writeTimeoutError
+                # wait for write operation, with the time left as timeout
+                if not self._wait_writable(timeout.time_left()):
+                    break   # cancel_write()
             except SerialException:
                 raise
             except OSError as e:
@@ -569,6 +774,16 @@ class Serial(SerialBase, PlatformSpecific):
                 # https://www.python.org/dev/peps/pep-0475.
                 if e.errno not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
                     raise SerialException('write failed: {}'.format(e))
+                if timeout.is_non_blocking:
+                    # nothing could be written, do not busy loop
+                    return written
+                if e.errno != errno.EINTR:
+                    # output buffer full: wait instead of busy looping, this
+                    # also notices cancel_write()
+                    if timeout.expired():
+                        raise writeTimeoutError
+                    if not self._wait_writable(timeout.time_left()):
+                        break
             except select.error as e:
                 # this is for Python 2.x
                 # ignore BlockingIOErrors and EINTR. all errors are shown
@@ -577,7 +792,7 @@ class Serial(SerialBase, PlatformSpecific):
                     raise SerialException('write failed: {}'.format(e))
             if not timeout.is_non_blocking and timeout.expired():
                 raise writeTimeoutError
-        return length - len(d)
+        return written
 
     def flush(self):
         """\
@@ -592,6 +807,7 @@ class Serial(SerialBase, PlatformSpecific):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise portNotOpenError
+        del self._read_ahead[:]
         termios.tcflush(self.fd, termios.TCIFLUSH)
 
     def reset_output_buffer(self):
@@ -667,6 +883,89 @@ class Serial(SerialBase, PlatformSpecific):
         s = fcntl.ioctl(self.fd, TIOCMGET, TIOCM_zero_str)
         return struct.unpack('I', s)[0] & TIOCM_CD != 0
 
+    @property
+    def modem_status(self):
+        """Read all modem status lines with a single ioctl"""
+        if not self.is_open:
+            raise portNotOpenError
+        s = fcntl.ioctl(self.fd, TIOCMGET, TIOCM_zero_str)
+        return modem_status_from_bits(struct.unpack('I', s)[0])
+
+    def wait_modem_change(self, timeout=None):
+        """\
+        Wait until one of the lines CTS, DSR, RI or CD changes. Returns the
+        new modem_status or None on timeout. Changes are detected relative
+        to the status returned by the previous call (or the status at the
+        time of the first call), so, like read(), it is meant to be called
+        from one thread.
+
+        A helper thread is started with the first call. It blocks in the
+        TIOCMIWAIT ioctl, close() interrupts it with MODEM_WAKEUP_SIGNAL. It
+        polls where the driver does not support TIOCMIWAIT or the signal
+        handler could not be installed (see modem_wakeup_available()).
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        with self._modem_condition:
+            if self._modem_thread is None:
+                self._modem_status = self.modem_status
+                self._modem_error = None
+                self._modem_use_tiocmiwait = TIOCMIWAIT is not None and modem_wakeup_available()
+                self._modem_thread = threading.Thread(
+                    target=self._modem_watch,
+                    name='pySerial modem line watcher for {}'.format(self.portstr))
+                self._modem_thread.daemon = True
+                self._modem_thread.start()
+            if self._modem_status_reported is None:
+                self._modem_status_reported = self._modem_status
+            timeout = Timeout(timeout)
+            while self._modem_status == self._modem_status_reported:
+                if not self.is_open:
+                    raise portNotOpenError
+                if self._modem_error is not None:
+                    raise SerialException('watching modem lines failed: {}'.format(self._modem_error))
+                if timeout.expired():
+                    return None
+                self._modem_condition.wait(timeout.time_left())
+            self._modem_status_reported = self._modem_status
+            return self._modem_status
+
+    def _modem_watch(self):
+        """Helper thread for wait_modem_change()"""
+        me = threading.current_thread()
+        fd = self.fd
+        use_tiocmiwait = self._modem_use_tiocmiwait
+        try:
+            while self._modem_thread is me:
+                if use_tiocmiwait:
+                    try:
+                        fcntl.ioctl(fd, TIOCMIWAIT, TIOCM_MODEM_STATUS)
+                    except IOError as e:
+                        if e.errno in (errno.EINVAL, errno.ENOTTY):
+                            # not supported by the driver, fall back to polling
+                            use_tiocmiwait = False
+                        elif e.errno != errno.EINTR:
+                            raise
+                    if self._modem_thread is not me:
+                        break   # interrupted by close()
+                s = fcntl.ioctl(fd, TIOCMGET, TIOCM_zero_str)
+                status = modem_status_from_bits(struct.unpack('I', s)[0])
+                with self._modem_condition:
+                    if self._modem_thread is not me:
+                        break
+                    if status != self._modem_status:
+                        self._modem_status = status
+                        self._modem_condition.notify_all()
+                    if not use_tiocmiwait:
+                        # close() notifies the condition, ending the wait early
+                        self._modem_condition.wait(self.modem_poll_interval)
+        except (IOError, OSError) as e:
+            with self._modem_condition:
+                if self._modem_thread is me:
+                    self._modem_error = e
+                    self._modem_thread = None
+                    self._modem_condition.notify_all()
+
     # - - platform specific - - - -
 
     @property
@@ -719,48 +1018,117 @@ class Serial(SerialBase, PlatformSpecific):
 
 class PosixPollSerial(Serial):
     """\
-    Poll based read implementation. Not all systems support poll properly.
+    Poll based implementation. Not all systems support poll properly.
     However this one has better handling of errors, such as a device
     disconnecting while it's in use (e.g. USB-serial unplugged).
+
+    The port and the abort pipes are registered once when the port is
+    opened, reading and writing only call poll(). cancel_read() and
+    cancel_write() are supported, as well as inter_byte_timeout.
     """
 
-    def read(self, size=1):
+    POLL_ERRORS = select.POLLERR | select.POLLHUP | select.POLLNVAL
+
+    def open(self):
+        super(PosixPollSerial, self).open()
+        self._poll_read = select.poll()
+        self._poll_read.register(self.fd, select.POLLIN | self.POLL_ERRORS)
+        self._poll_read.register(self.pipe_abort_read_r, select.POLLIN)
+        self._poll_write = select.poll()
+        self._poll_write.register(self.fd, select.POLLOUT | self.POLL_ERRORS)
+        self._poll_write.register(self.pipe_abort_write_r, select.POLLIN)
+
+    def close(self):
+        self._poll_read = self._poll_write = None
+        super(PosixPollSerial, self).close()
+
+    def _poll(self, poll, abort_fd, timeout):
         """\
-        Read size bytes from the serial port. If a timeout is set it may
-        return less characters as requested. With no timeout it will block
-        until the requested number of bytes is read.
+        Wait for the port or its abort pipe, at most timeout seconds (None:
+        no limit). Returns (ready, aborted). Errors reported for the port
+        (e.g. unplugged USB adapter) raise SerialException.
         """
-        if not self.is_open:
-            raise portNotOpenError
-        read = bytearray()
-        poll = select.poll()
-        poll.register(self.fd, select.POLLIN | select.POLLERR | select.POLLHUP | select.POLLNVAL)
-        if size > 0:
-            while len(read) < size:
-                # print "\tread(): size",size, "have", len(read)    #debug
-                # wait until device becomes ready to read (or something fails)
-                for fd, event in poll.poll(self._timeout * 1000):
-                    if event & (select.POLLERR | select.POLLHUP | select.POLLNVAL):
-                        raise SerialException('device reports error (poll)')
-                    #  we don't care if it is select.POLLIN or timeout, that's
-                    #  handled below
-                buf = os.read(self.fd, size - len(read))
-                read.extend(buf)
-                if ((self._timeout is not None and self._timeout >= 0) or
-                        (self._inter_byte_timeout is not None and self._inter_byte_timeout > 0)) and not buf:
-                    break   # early abort on timeout
-        return bytes(read)
+        while True:
+            try:
+                events = poll.poll(None if timeout is None else timeout * 1000)
+            except select.error as e:
+                # select.error is OSError on Python 3
+                if e.args[0] != errno.EINTR:
+                    raise SerialException('poll failed: {}'.format(e))
+                continue
+            break
+        ready = aborted = False
+        for fd, event in events:
+            if fd == abort_fd:
+                os.read(abort_fd, 1000)
+                aborted = True
+            elif event & self.POLL_ERRORS:
+                raise SerialException('device reports error (poll)')
+            else:
+                ready = True
+        return ready, aborted
+
+    def _wait_readable(self, timeout):
+        ready, aborted = self._poll(self._poll_read, self.pipe_abort_read_r, timeout)
+        return ready and not aborted
+
+    def _wait_writable(self, timeout):
+        ready, aborted = self._poll(self._poll_write, self.pipe_abort_write_r, timeout)
+        if aborted:
+            return False
+        if not ready:
+            raise writeTimeoutError
+        return True
+
+    def _readinto(self, buf, timeout):
+        """\
+        Read into the byte memoryview buf until it is full or timeout (a
+        Timeout) expires. With inter_byte_timeout, reading stops when no byte
+        arrives within that time after the last one.
+        """
+        size = len(buf)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        while n < size:
+            # wait until device becomes ready to read (or something fails)
+            if not self._wait_readable(timeout.time_left()):
+                break   # timeout or cancel_read()
+            try:
+                count = read_into(self.fd, buf[n:])
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
+                    raise SerialException('read failed: {}'.format(e))
+                continue
+            if not count:
+                raise SerialException(
+                    'device reports readiness to read but returned no data '
+                    '(device disconnected or multiple access on port?)')
+            n += count
+            if self._inter_byte_timeout is not None:
+                # restart() would keep an infinite timeout infinite
+                timeout = Timeout(self._inter_byte_timeout)
+            elif timeout.expired():
+                break
+        return n
 
 
 class VTIMESerial(Serial):
     """\
     Implement timeout using vtime of tty device instead of using select.
-    This means that no inter character timeout can be specified and that
-    the error handling is degraded.
+    The kernel collects the data as configured with VMIN/VTIME and each read
+    is a single system call, without select. The error handling is degraded.
 
     Overall timeout is disabled when inter-character timeout is used.
+
+    cancel_read() switches the port to non-blocking mode and wakes up a
+    blocked read with a termios update; it uses no locks, so it may also be
+    called from a signal handler. read_exactly() uses VMIN to read frames of
+    a fixed size with one wake up per frame.
     """
 
+    _read_cancelled = False
+
     def _reconfigure_port(self, force_update=True):
         """Set communication parameters on opened port."""
         super(VTIMESerial, self)._reconfigure_port()
@@ -768,21 +1136,33 @@ class VTIMESerial(Serial):
 
         if self._inter_byte_timeout is not None:
             vmin = 1
-            vtime = int(self._inter_byte_timeout * 10)
+            vtime = self._vtime(self._inter_byte_timeout)
         elif self._timeout is None:
             vmin = 1
             vtime = 0
         else:
             vmin = 0
-            vtime = int(self._timeout * 10)
+            vtime = self._vtime(self._timeout)
+        self._timeout_cc = (vmin, vtime)
+        self._cc = None
+        self._set_vmin_vtime(vmin, vtime)
+
+    @staticmethod
+    def _vtime(timeout):
+        vtime = int(timeout * 10)
+        if vtime < 0 or vtime > 255:
+            raise ValueError('Invalid vtime: {!r}'.format(vtime))
+        return vtime
+
+    def _set_vmin_vtime(self, vmin, vtime):
+        """Update VMIN and VTIME, if they are not already set"""
+        if self._cc == (vmin, vtime):
+            return
         try:
             orig_attr = termios.tcgetattr(self.fd)
             iflag, oflag, cflag, lflag, ispeed, ospeed, cc = orig_attr
         except termios.error as msg:      # if a port is nonexistent but has a /dev file, it'll fail here
             raise serial.SerialException("Could not configure port: {}".format(msg))
-
-        if vtime < 0 or vtime > 255:
-            raise ValueError('Invalid vtime: {!r}'.format(vtime))
         cc[termios.VTIME] = vtime
         cc[termios.VMIN] = vmin
 
@@ -790,22 +1170,97 @@ class VTIMESerial(Serial):
                 self.fd,
                 termios.TCSANOW,
                 [iflag, oflag, cflag, lflag, ispeed, ospeed, cc])
+        self._cc = (vmin, vtime)
 
-    def read(self, size=1):
+    def _read_once(self, buf):
         """\
-        Read size bytes from the serial port. If a timeout is set it may
-        return less characters as requested. With no timeout it will block
-        until the requested number of bytes is read.
+        Read into the memoryview buf with one system call. Returns the number
+        of bytes (0 on timeout) or None if cancel_read() was called.
+        """
+        while not self._read_cancelled:
+            try:
+                return read_into(self.fd, buf)
+            except OSError as e:
+                # EAGAIN: woken up by cancel_read(), the flag is set
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    raise SerialException('read failed: {}'.format(e))
+        self._read_cancelled = False
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, 0)  # clear O_NONBLOCK again
+        return None
+
+    def _readinto(self, buf, timeout):
+        """\
+        Read into the byte memoryview buf. The kernel applies the timeout
+        (VTIME), the timeout argument is not used.
+        """
+        size = len(buf)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        self._set_vmin_vtime(*self._timeout_cc)
+        while n < size:
+            count = self._read_once(buf[n:])
+            if not count:
+                break
+            n += count
+        return n
+
+    def read_some(self, size=4096, gap=None):
+        """\
+        Return the data of one read system call, up to size bytes. The kernel
+        waits as configured with timeout or inter_byte_timeout; gap is not
+        used, set inter_byte_timeout to have the kernel collect bursts.
         """
         if not self.is_open:
             raise portNotOpenError
-        read = bytearray()
-        while len(read) < size:
-            buf = os.read(self.fd, size - len(read))
-            if not buf:
+        buf = bytearray(size)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        if not n:
+            self._set_vmin_vtime(*self._timeout_cc)
+            n = self._read_once(memoryview(buf)) or 0
+        del buf[n:]
+        return bytes(buf)
+
+    def read_exactly(self, size):
+        """\
+        Read size bytes. VMIN is set to size (at most 255), so the kernel
+        wakes up the reader only when a frame is complete. Repeated calls with
+        the same size do not change the port settings again.
+
+        The timeout is not applied (termios can not combine it with VMIN), use
+        cancel_read() to abort. If inter_byte_timeout is set, reading also
+        ends when no more byte arrives within that time. Returns less than
+        size bytes only in these cases.
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        buf = bytearray(size)
+        view = memoryview(buf)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        vtime = 0 if self._inter_byte_timeout is None else self._vtime(self._inter_byte_timeout)
+        while n < size:
+            vmin = min(size - n, 255)
+            self._set_vmin_vtime(vmin, vtime)
+            count = self._read_once(view[n:])
+            if not count:
                 break
-            read.extend(buf)
-        return bytes(read)
+            n += count
+            if count < vmin:
+                break   # inter byte timeout
+        return bytes(view[:n])
 
-    # hack to make hasattr return false
-    cancel_read = property()
+    def cancel_read(self):
+        """\
+        Abort a read in progress (or the next one, if there is none) from
+        another thread.
+        """
+        if self.is_open:
+            self._read_cancelled = True
+            fcntl.fcntl(self.fd, fcntl.F_SETFL, os.O_NONBLOCK)
+            # any termios update wakes up readers waiting in the tty layer,
+            # which then notice O_NONBLOCK
+            termios.tcsetattr(self.fd, termios.TCSANOW, termios.tcgetattr(self.fd))
@@ -7,6 +7,7 @@
 #
 # SPDX-License-Identifier:    BSD-3-Clause
 
+import collections
 import io
 import time
 
@@ -66,6 +67,24 @@ def to_bytes(seq):
         return bytes(bytearray(seq))
 
 
+def to_buffer(seq):
+    """\
+    Return a byte-wise memoryview of seq without copying if it supports the
+    buffer protocol (bytes, bytearray, memoryview, array, ...), otherwise a
+    memoryview of to_bytes(seq).
+    """
+    if not isinstance(seq, unicode):
+        try:
+            view = memoryview(seq)
+        except TypeError:
+            pass
+        else:
+            # cast needs a C-contiguous buffer, e.g. not a slice with a step
+            if view.c_contiguous:
+                return view.cast('B')
+    return memoryview(to_bytes(seq))
+
+
 # create control bytes
 XON = to_bytes([17])
 XOFF = to_bytes([19])
@@ -99,6 +118,10 @@ writeTimeoutError = SerialTimeoutException('Write timeout')
 portNotOpenError = SerialException('Attempting to use a port that is not open')
 
 
+# snapshot of the modem status lines, see SerialBase.modem_status
+ModemStatus = collections.namedtuple('ModemStatus', 'cts dsr ri cd')
+
+
 class Timeout(object):
     """\
     Abstraction for timeout operations. Using time.monotonic() if available
@@ -213,6 +236,11 @@ class SerialBase(io.RawIOBase):
         self._dtr_state = True
         self._break_state = False
         self._exclusive = None
+        # bytes that read_until() received beyond the terminator, they are
+        # returned first by the next read
+        self._read_ahead = bytearray()
+        # last value returned by wait_modem_change()
+        self._modem_status_reported = None
 
         # assign values using get/set methods using the properties feature
         self.port = port
@@ -478,6 +506,47 @@ class SerialBase(io.RawIOBase):
         if self.is_open:
             self._update_break_state()
 
+    #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
+    # modem status lines
+
+    # polling interval of wait_modem_change() where the platform can not
+    # wait for changes
+    modem_poll_interval = 0.1
+
+    @property
+    def modem_status(self):
+        """\
+        Read all modem status lines at once, returns a ModemStatus tuple
+        (cts, dsr, ri, cd). Backends override this where the lines can be read
+        with a single request.
+        """
+        return ModemStatus(self.cts, self.dsr, self.ri, self.cd)
+
+    def wait_modem_change(self, timeout=None):
+        """\
+        Wait until one of the lines CTS, DSR, RI or CD changes. Returns the
+        new modem_status or None on timeout. Changes are detected relative
+        to the status returned by the previous call (or the status at the
+        time of the first call), so, like read(), it is meant to be called
+        from one thread. This implementation polls the lines.
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        if self._modem_status_reported is None:
+            self._modem_status_reported = self.modem_status
+        timeout = Timeout(timeout)
+        while True:
+            status = self.modem_status
+            if status != self._modem_status_reported:
+                self._modem_status_reported = status
+                return status
+            if timeout.expired():
+                return None
+            if timeout.is_infinite:
+                time.sleep(self.modem_poll_interval)
+            else:
+                time.sleep(min(self.modem_poll_interval, timeout.time_left()))
+
     #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
     # functions useful for RS-485 adapters
 
@@ -647,28 +716,120 @@ class SerialBase(io.RawIOBase):
         """
         return self.read(self.in_waiting)
 
+    def read_some(self, size=4096, gap=None):
+        """\
+        Wait until data is available (at most timeout seconds) and return what
+        has arrived, up to size bytes. If gap is given, reading continues as
+        long as more bytes arrive within gap seconds, so that a burst that is
+        still being received is returned in one piece. Returns an empty bytes
+        object on timeout.
+
+        This generic implementation is based on in_waiting and read(), the
+        POSIX implementation waits for readiness and reads with one system
+        call.
+        """
+        data = bytearray(self.read(min(size, self.in_waiting) or 1))
+        while data and len(data) < size:
+            n = min(size - len(data), self.in_waiting)
+            if not n:
+                if gap is None:
+                    break
+                time.sleep(gap)
+                n = min(size - len(data), self.in_waiting)
+                if not n:
+                    break
+            data += self.read(n)
+        return bytes(data)
+
+    def write_many(self, buffers):
+        """\
+        Write several buffers, e.g. header, payload and checksum of a packet,
+        as if they were concatenated. Returns the number of bytes written.
+
+        This generic implementation joins the buffers and calls write(), the
+        POSIX implementation passes them to os.writev() without copying.
+        """
+        return self.write(b''.join(to_bytes(data) for data in buffers))
+
     def read_until(self, terminator=LF, size=None):
         """\
         Read until a termination sequence is found ('\n' by default), the size
         is exceeded or until timeout occurs.
+
+        All data that is waiting is read at once, bytes following the
+        termination sequence are kept and returned by the next read.
         """
         lenterm = len(terminator)
-        line = bytearray()
+        line = self._read_ahead
+        self._read_ahead = bytearray()
         timeout = Timeout(self._timeout)
-        while True:
-            c = self.read(1)
-            if c:
-                line += c
-                if line[-lenterm:] == terminator:
+        expired = False
+        start = 0
+        try:
+            while True:
+                pos = line.find(terminator, start)
+                if pos >= 0 and (size is None or pos + lenterm <= size):
+                    end = pos + lenterm
                     break
                 if size is not None and len(line) >= size:
+                    end = size
                     break
-            else:
-                break
-            if timeout.expired():
-                break
+                if expired:
+                    end = len(line)
+                    break
+                # the terminator may span the old and the new data
+                start = max(0, len(line) - lenterm + 1)
+                n = max(1, self.in_waiting)
+                if size is not None:
+                    n = min(n, size - len(line))
+                data = self.read(n)
+                if not data:
+                    end = len(line)
+                    break
+                line += data
+                expired = timeout.expired()
+        except:
+            # the data received so far is returned by the next read
+            line += self._read_ahead
+            self._read_ahead = line
+            raise
+        self._read_ahead = line[end:]
+        del line[end:]
         return bytes(line)
 
+    def _read_growing(self, size):
+        """\
+        read() for the implementations that provide _readinto(buf, timeout).
+        The buffer grows with the received data instead of being allocated
+        with size bytes up front, e.g. read(10**8) with a timeout allocates
+        little while nothing arrives. All reads share one timeout.
+        """
+        timeout = Timeout(self._timeout)
+        if size <= 4096:
+            read = bytearray(size)
+        else:
+            # no ioctl for in_waiting on small reads such as read(1)
+            read = bytearray(min(size, max(self.in_waiting, 4096)))
+        n = 0
+        while True:
+            # the temporary view is released when the call returns
+            n += self._readinto(memoryview(read)[n:], timeout)
+            if n < len(read) or n == size or timeout.expired():
+                break
+            # the buffer is full, more may be waiting: double it, up to size
+            read += bytes(min(size - n, len(read)))
+        del read[n:]
+        return bytes(read)
+
+    def _pop_read_ahead(self, size):
+        """\
+        Remove and return up to size bytes of the read-ahead buffer. To be used
+        by the read functions of the subclasses before reading the port.
+        """
+        data = self._read_ahead[:size]
+        del self._read_ahead[:size]
+        return data
+
     def iread_until(self, *args, **kwargs):
         """\
         Read lines, implemented as generator. It will raise StopIteration on
@@ -255,7 +255,7 @@ class Serial(SerialBase):
         comstat = win32.COMSTAT()
         if not win32.ClearCommError(self._port_handle, ctypes.byref(flags), ctypes.byref(comstat)):
             raise SerialException("ClearCommError failed ({!r})".format(ctypes.WinError()))
-        return comstat.cbInQue
+        return comstat.cbInQue + len(self._read_ahead)
 
     def read(self, size=1):
         """\
@@ -265,6 +265,8 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise portNotOpenError
+        read_ahead = self._pop_read_ahead(size)
+        size -= len(read_ahead)
         if size > 0:
             win32.ResetEvent(self._overlapped_read.hEvent)
             flags = win32.DWORD()
@@ -296,7 +298,7 @@ class Serial(SerialBase):
                 read = bytes()
         else:
             read = bytes()
-        return bytes(read)
+        return bytes(read_ahead + read)
 
     def write(self, data):
         """Output the given byte string over the serial port."""
@@ -350,6 +352,7 @@ class Serial(SerialBase):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise portNotOpenError
+        del self._read_ahead[:]
         win32.PurgeComm(self._port_handle, win32.PURGE_RXCLEAR | win32.PURGE_RXABORT)
 
     def reset_output_buffer(self):
@@ -17,6 +17,14 @@ class Protocol(object):
     """\
     Protocol as used by the ReaderThread. This base class provides empty
     implementations of all methods.
+
+    Protocols that want to be notified of modem line changes implement
+    modem_status_changed(status), it is called with a ModemStatus tuple (see
+    serial.wait_modem_change()) from a separate thread.
+
+    Protocols may implement pause_writing() and resume_writing(), they are
+    called by a ReaderThread with an output queue when its buffer crosses the
+    high and low water marks (like asyncio.Protocol).
     """
 
     def connection_made(self, transport):
@@ -47,6 +55,7 @@ class Packetizer(Protocol):
     def __init__(self):
         self.buffer = bytearray()
         self.transport = None
+        self._scanned = 0   # the buffer contains no TERMINATOR before this offset
 
     def connection_made(self, transport):
         """Store transport"""
@@ -59,10 +68,27 @@ class Packetizer(Protocol):
 
     def data_received(self, data):
         """Buffer received data, find TERMINATOR, call handle_packet"""
+        lenterm = len(self.TERMINATOR)
+        # the scanned data contains no terminator, except for its end that
+        # may be completed by the new data (clamped, subclasses may clear
+        # the buffer)
+        pos = min(self._scanned, max(0, len(self.buffer) - lenterm + 1))
         self.buffer.extend(data)
-        while self.TERMINATOR in self.buffer:
-            packet, self.buffer = self.buffer.split(self.TERMINATOR, 1)
-            self.handle_packet(packet)
+        start = 0
+        try:
+            while True:
+                pos = self.buffer.find(self.TERMINATOR, pos)
+                if pos < 0:
+                    pos = len(self.buffer) - lenterm + 1
+                    break
+                packet = self.buffer[start:pos]
+                start = pos = pos + lenterm
+                self.handle_packet(packet)
+        finally:
+            # remove the processed packets, once per call. if handle_packet
+            # raised, the rest is not scanned yet
+            del self.buffer[:start]
+            self._scanned = max(0, pos - start)
 
     def handle_packet(self, packet):
         """Process packets - to be overridden by subclassing"""
@@ -97,17 +123,34 @@ class FramedPacket(Protocol):
 
     def data_received(self, data):
         """Find data enclosed in START/STOP, call handle_packet"""
-        for byte in serial.iterbytes(data):
-            if byte == self.START:
+        data = serial.to_bytes(data)
+        pos = 0
+        start = data.find(self.START)
+        stop = data.find(self.STOP)
+        while pos < len(data):
+            # search the markers again, once they are passed
+            if 0 <= start < pos:
+                start = data.find(self.START, pos)
+            if 0 <= stop < pos:
+                stop = data.find(self.STOP, pos)
+            if stop >= 0 and (start < 0 or stop < start):
+                marker = stop
+            elif start >= 0:
+                marker = start
+            else:
+                marker = len(data)
+            if marker > pos:
+                if self.in_packet:
+                    self.packet.extend(data[pos:marker])
+                else:
+                    self.handle_out_of_packet_data(data[pos:marker])
+            if marker == start:
                 self.in_packet = True
-            elif byte == self.STOP:
+            elif marker == stop:
                 self.in_packet = False
-                self.handle_packet(bytes(self.packet)) # make read-only copy
+                self.handle_packet(bytes(self.packet))  # make read-only copy
                 del self.packet[:]
-            elif self.in_packet:
-                self.packet.extend(byte)
-            else:
-                self.handle_out_of_packet_data(byte)
+            pos = marker + 1
 
     def handle_packet(self, packet):
         """Process packets - to be overridden by subclassing"""
@@ -151,9 +194,24 @@ class ReaderThread(threading.Thread):
 
     Calls to close() will close the serial port but it is also possible to just
     stop() this thread and continue the serial port instance otherwise.
+
+    Incoming data is read with read(in_waiting or 1). With read_size set, it
+    is read with serial.read_some(read_size, read_gap) instead: the reader
+    waits until data is available and reads all of it at once, with a
+    read_gap (seconds) it also waits for the rest of a burst that is still
+    being received, so that the protocol gets it with one data_received()
+    call.
+
+    With write_queue=True, write() does not block: data is appended to an
+    output buffer and written by a separate writer thread, small writes that
+    pile up while the port is busy are merged into one serial.write(). The
+    protocol's pause_writing() is called when the buffer exceeds high_water
+    and resume_writing() when it drops to low_water. drain() waits until
+    the buffer is written.
     """
 
-    def __init__(self, serial_instance, protocol_factory):
+    def __init__(self, serial_instance, protocol_factory, write_queue=False, high_water=64 * 1024, low_water=None,
+                 read_size=None, read_gap=None):
         """\
         Initialize thread.
 
@@ -168,18 +226,40 @@ class ReaderThread(threading.Thread):
         self._lock = threading.Lock()
         self._connection_made = threading.Event()
         self.protocol = None
+        self.read_size = read_size
+        self.read_gap = read_gap
+        self._error = None          # from the modem line watcher or writer thread
+        self._write_queue = write_queue
+        self._write_buffer = bytearray()
+        self._write_condition = threading.Condition()
+        self._writing = False       # writer thread is busy with a chunk
+        self._writer = None
+        self._writer_alive = False
+        self._write_paused = False
+        self.set_write_buffer_limits(high_water, low_water)
 
     def stop(self):
-        """Stop the reader thread"""
+        """Stop the reader thread (and the writer thread, if any)"""
         self.alive = False
         if hasattr(self.serial, 'cancel_read'):
             self.serial.cancel_read()
         self.join(2)
+        if self._writer is not None:
+            with self._write_condition:
+                self._writer_alive = False
+                self._write_condition.notify_all()
+            self._writer.join(2)
+            self._writer = None
 
     def run(self):
         """Reader loop"""
         if not hasattr(self.serial, 'cancel_read'):
             self.serial.timeout = 1
+        if self._write_queue:
+            self._writer_alive = True
+            self._writer = threading.Thread(target=self._write_loop)
+            self._writer.daemon = True
+            self._writer.start()
         self.protocol = self.protocol_factory()
         try:
             self.protocol.connection_made(self)
@@ -190,10 +270,17 @@ class ReaderThread(threading.Thread):
             return
         error = None
         self._connection_made.set()
+        if hasattr(self.protocol, 'modem_status_changed'):
+            watcher = threading.Thread(target=self._watch_modem_lines, args=(self.protocol,))
+            watcher.daemon = True
+            watcher.start()
         while self.alive and self.serial.is_open:
             try:
-                # read all that is there or wait for one byte (blocking)
-                data = self.serial.read(self.serial.in_waiting or 1)
+                if self.read_size is None:
+                    # read all that is there or wait for one byte (blocking)
+                    data = self.serial.read(self.serial.in_waiting or 1)
+                else:
+                    data = self.serial.read_some(self.read_size, self.read_gap)
             except serial.SerialException as e:
                 # probably some I/O problem such as disconnected USB serial
                 # adapters -> exit
@@ -208,21 +295,143 @@ class ReaderThread(threading.Thread):
                         error = e
                         break
         self.alive = False
+        if error is None:
+            error = self._error
         self.protocol.connection_lost(error)
         self.protocol = None
 
+    def _watch_modem_lines(self, protocol):
+        """Modem line loop, dispatches changes to the protocol"""
+        while self.alive and self.serial.is_open:
+            try:
+                # the timeout is only used to notice stop()
+                status = self.serial.wait_modem_change(timeout=1)
+            except (IOError, OSError):
+                # port without modem lines (SerialException is an IOError)
+                break
+            if status is not None and self.alive:
+                try:
+                    protocol.modem_status_changed(status)
+                except Exception as e:
+                    self._fail(e)
+                    break
+
+    def _fail(self, error):
+        """End the reader loop from another thread, connection_lost gets the error"""
+        self._error = error
+        self.alive = False
+        if hasattr(self.serial, 'cancel_read'):
+            self.serial.cancel_read()
+
     def write(self, data):
-        """Thread safe writing (uses lock)"""
-        with self._lock:
-            self.serial.write(data)
+        """\
+        Thread safe writing (uses lock). With an output queue, data is only
+        appended to the buffer.
+        """
+        if not self._write_queue:
+            with self._lock:
+                self.serial.write(data)
+            return
+        pause = False
+        with self._write_condition:
+            if self._error is not None and not self._writer_alive:
+                raise serial.SerialException('writer stopped: {}'.format(self._error))
+            self._write_buffer.extend(data)
+            if not self._write_paused and len(self._write_buffer) > self.high_water:
+                self._write_paused = pause = True
+            self._write_condition.notify_all()
+        if pause and self.protocol is not None and hasattr(self.protocol, 'pause_writing'):
+            self.protocol.pause_writing()
+
+    def _write_loop(self):
+        """Writer loop, writes the whole buffer with one call per iteration"""
+        while True:
+            with self._write_condition:
+                while not self._write_buffer and self._writer_alive:
+                    self._write_condition.wait()
+                if not self._write_buffer:
+                    break
+                data = self._write_buffer
+                self._write_buffer = bytearray()
+                self._writing = True
+            try:
+                with self._lock:
+                    self.serial.write(data)
+            except Exception as e:
+                with self._write_condition:
+                    del self._write_buffer[:]
+                    self._writing = False
+                    self._writer_alive = False
+                    self._write_condition.notify_all()
+                self._fail(e)
+                break
+            resume = False
+            with self._write_condition:
+                self._writing = False
+                if self._write_paused and len(self._write_buffer) <= self.low_water:
+                    self._write_paused = False
+                    resume = True
+                self._write_condition.notify_all()
+            if resume and self.protocol is not None and hasattr(self.protocol, 'resume_writing'):
+                self.protocol.resume_writing()
+
+    def get_write_buffer_size(self):
+        """Number of bytes in the output queue"""
+        with self._write_condition:
+            return len(self._write_buffer)
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        """\
+        Set the water marks of the output queue, like asyncio's
+        WriteTransport: low defaults to high / 4.
+        """
+        if high is None:
+            high = 64 * 1024
+        if low is None:
+            low = high // 4
+        if not 0 <= low <= high:
+            raise ValueError('high ({!r}) must be >= low ({!r}) must be >= 0'.format(high, low))
+        self.high_water = high
+        self.low_water = low
+
+    def drain(self, timeout=None):
+        """\
+        Wait until the output queue is written to the port. Returns False on
+        timeout, raises SerialException if the writer failed.
+        """
+        timeout = serial.Timeout(timeout)
+        with self._write_condition:
+            while self._write_buffer or self._writing:
+                if timeout.expired():
+                    return False
+                self._write_condition.wait(timeout.time_left())
+            if self._error is not None and not self._writer_alive and self._write_queue:
+                raise serial.SerialException('writer stopped: {}'.format(self._error))
+        return True
 
     def close(self):
-        """Close the serial port and exit reader thread (uses lock)"""
+        """\
+        Close the serial port and exit reader thread (uses lock). Queued
+        output is written first, waiting at most the port's write_timeout.
+        Writes of other threads are allowed to finish; if one is still
+        blocked after write_timeout (e.g. by a stalled peer), it is cancelled
+        where the port supports cancel_write().
+        """
+        write_timeout = self.serial.write_timeout
+        if self._writer is not None and self._writer_alive:
+            self.drain(write_timeout)
         # use the lock to let other threads finish writing
-        with self._lock:
+        if not self._lock.acquire(timeout=-1 if write_timeout is None else write_timeout):
+            # a write blocked by a stalled peer would hold the lock forever
+            if hasattr(self.serial, 'cancel_write'):
+                self.serial.cancel_write()
+            self._lock.acquire()
+        try:
             # first stop reading, so that closing can be done on idle port
             self.stop()
             self.serial.close()
+        finally:
+            self._lock.release()
 
     def connect(self):
         """
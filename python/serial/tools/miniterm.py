@@ -354,6 +354,8 @@ class Miniterm(object):
         self.receiver_thread = None
         self.rx_decoder = None
         self.tx_decoder = None
+        self.read_size = 4096
+        self.read_gap = None    # seconds to wait for the rest of a burst
 
     def _start_reader(self):
         """Start reader thread"""
@@ -441,8 +443,8 @@ class Miniterm(object):
         """loop and copy serial->console"""
         try:
             while self.alive and self._reader_alive:
-                # read all that is there or wait for one byte
-                data = self.serial.read(self.serial.in_waiting or 1)
+                # wait for data and read all that is there
+                data = self.serial.read_some(self.read_size, self.read_gap)
                 if data:
                     if self.raw:
                         self.console.write_bytes(data)
@@ -849,6 +851,13 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
         help="Do no apply any encodings/transformations",
         default=False)
 
+    group.add_argument(
+        "--read-gap",
+        type=float,
+        metavar='SECONDS',
+        help="collect received data until there is a pause of this length, default: show data immediately",
+        default=None)
+
     group = parser.add_argument_group("hotkeys")
 
     group.add_argument(
@@ -949,6 +958,7 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
     miniterm.exit_character = unichr(args.exit_char)
     miniterm.menu_character = unichr(args.menu_char)
     miniterm.raw = args.raw
+    miniterm.read_gap = args.read_gap
     miniterm.set_rx_encoding(args.serial_port_encoding)
     miniterm.set_tx_encoding(args.serial_port_encoding)
 
@@ -15,17 +15,15 @@
 # - "debug" print diagnostic messages
 import logging
 import numbers
+import threading
 import time
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
-try:
-    import queue
-except ImportError:
-    import Queue as queue
 
-from serial.serialutil import SerialBase, SerialException, to_bytes, iterbytes, writeTimeoutError, portNotOpenError
+from serial.serialutil import SerialBase, SerialException, to_bytes, writeTimeoutError, portNotOpenError, \
+    Timeout
 
 # map log level names to constants. used in from_url()
 LOGGER_LEVELS = {
@@ -43,9 +41,13 @@ class Serial(SerialBase):
                  9600, 19200, 38400, 57600, 115200)
 
     def __init__(self, *args, **kwargs):
-        self.buffer_size = 4096
-        self.queue = None
+        self.buffer_size = 4096     # in bytes
+        self.buffer = None
         self.logger = None
+        # the condition protects the buffer and the cancel flags, it is
+        # notified whenever one of them changes
+        self._condition = threading.Condition()
+        self._cancel_read = False
         self._cancel_write = False
         super(Serial, self).__init__(*args, **kwargs)
 
@@ -57,7 +59,7 @@ class Serial(SerialBase):
         if self.is_open:
             raise SerialException("Port is already open.")
         self.logger = None
-        self.queue = queue.Queue(self.buffer_size)
+        self.buffer = bytearray()
 
         if self._port is None:
             raise SerialException("Port must be configured before it can be used.")
@@ -78,11 +80,9 @@ class Serial(SerialBase):
 
     def close(self):
         if self.is_open:
-            self.is_open = False
-            try:
-                self.queue.put_nowait(None)
-            except queue.Full:
-                pass
+            with self._condition:
+                self.is_open = False
+                self._condition.notify_all()
         super(Serial, self).close()
 
     def _reconfigure_port(self):
@@ -129,8 +129,8 @@ class Serial(SerialBase):
         if self.logger:
             # attention the logged value can differ from return value in
             # threaded environments...
-            self.logger.debug('in_waiting -> {:d}'.format(self.queue.qsize()))
-        return self.queue.qsize()
+            self.logger.debug('in_waiting -> {:d}'.format(len(self.buffer)))
+        return len(self.buffer) + len(self._read_ahead)
 
     def read(self, size=1):
         """\
@@ -140,36 +140,53 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise portNotOpenError
-        if self._timeout is not None and self._timeout != 0:
-            timeout = time.time() + self._timeout
-        else:
-            timeout = None
-        data = bytearray()
-        while size > 0 and self.is_open:
-            try:
-                b = self.queue.get(timeout=self._timeout)  # XXX inter char timeout
-            except queue.Empty:
-                if self._timeout == 0:
+        return self._read_growing(size)
+
+    def readinto(self, b):
+        """\
+        Read bytes into a pre-allocated, writable buffer and return the number
+        of bytes read. If a timeout is set it may read less bytes than fit
+        into the buffer.
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        return self._readinto(memoryview(b).cast('B'), Timeout(self._timeout))
+
+    def _readinto(self, buf, timeout):
+        """Read into the byte memoryview buf until it is full or timeout (a Timeout) expires"""
+        size = len(buf)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        with self._condition:
+            while n < size:
+                if self.buffer:
+                    count = min(size - n, len(self.buffer))
+                    buf[n:n + count] = self.buffer[:count]
+                    del self.buffer[:count]
+                    n += count
+                    # there is space for blocked writers now
+                    self._condition.notify_all()
+                elif self._cancel_read or not self.is_open:
                     break
-            else:
-                if b is not None:
-                    data += b
-                    size -= 1
-                else:
+                elif timeout.expired():
+                    if self.logger and not timeout.is_non_blocking:
+                        self.logger.info('read timeout')
                     break
-            # check for timeout now, after data has been read.
-            # useful for timeout = 0 (non blocking) read
-            if timeout and time.time() > timeout:
-                if self.logger:
-                    self.logger.info('read timeout')
-                break
-        return bytes(data)
+                else:
+                    self._condition.wait(timeout.time_left())
+            self._cancel_read = False
+        return n
 
     def cancel_read(self):
-        self.queue.put_nowait(None)
+        with self._condition:
+            self._cancel_read = True
+            self._condition.notify_all()
 
     def cancel_write(self):
-        self._cancel_write = True
+        with self._condition:
+            self._cancel_write = True
+            self._condition.notify_all()
 
     def write(self, data):
         """\
@@ -180,7 +197,7 @@ class Serial(SerialBase):
         self._cancel_write = False
         if not self.is_open:
             raise portNotOpenError
-        data = to_bytes(data)
+        data = memoryview(to_bytes(data))
         # calculate aprox time that would be used to send the data
         time_used_to_send = 10.0 * len(data) / self._baudrate
         # when a write timeout is configured check if we would be successful
@@ -194,9 +211,23 @@ class Serial(SerialBase):
             if self._cancel_write:
                 return 0  # XXX
             raise writeTimeoutError
-        for byte in iterbytes(data):
-            self.queue.put(byte, timeout=self._write_timeout)
-        return len(data)
+        timeout = Timeout(self._write_timeout)
+        n = 0
+        with self._condition:
+            while n < len(data):
+                space = self.buffer_size - len(self.buffer)
+                if space > 0:
+                    self.buffer += data[n:n + space]
+                    n += min(space, len(data) - n)
+                    self._condition.notify_all()
+                elif self._cancel_write or not self.is_open or timeout.is_non_blocking:
+                    break
+                elif timeout.expired():
+                    raise writeTimeoutError
+                else:
+                    # wait for the reader to make some space
+                    self._condition.wait(timeout.time_left())
+        return n
 
     def reset_input_buffer(self):
         """Clear input buffer, discarding all that is in the buffer."""
@@ -204,11 +235,10 @@ class Serial(SerialBase):
             raise portNotOpenError
         if self.logger:
             self.logger.info('reset_input_buffer()')
-        try:
-            while self.queue.qsize():
-                self.queue.get_nowait()
-        except queue.Empty:
-            pass
+        del self._read_ahead[:]
+        with self._condition:
+            del self.buffer[:]
+            self._condition.notify_all()
 
     def reset_output_buffer(self):
         """\
@@ -219,11 +249,9 @@ class Serial(SerialBase):
             raise portNotOpenError
         if self.logger:
             self.logger.info('reset_output_buffer()')
-        try:
-            while self.queue.qsize():
-                self.queue.get_nowait()
-        except queue.Empty:
-            pass
+        with self._condition:
+            del self.buffer[:]
+            self._condition.notify_all()
 
     def _update_break_state(self):
         """\
@@ -18,15 +18,26 @@
 
 import errno
 import logging
+import os
 import select
 import socket
+import struct
 import time
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
+try:
+    import selectors
+except ImportError:
+    selectors = None    # Python 2, select() is called each time instead
+try:
+    import fcntl
+    import termios
+except ImportError:
+    fcntl = None    # no FIONREAD, in_waiting only tells if there is data
 
-from serial.serialutil import SerialBase, SerialException, to_bytes, \
+from serial.serialutil import SerialBase, SerialException, to_buffer, \
     portNotOpenError, writeTimeoutError, Timeout
 
 # map log level names to constants. used in from_url()
@@ -39,9 +50,22 @@ LOGGER_LEVELS = {
 
 POLL_TIMEOUT = 5
 
+# maximum number of buffers passed to one sendmsg call
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 16    # minimum required by POSIX
+
 
 class Serial(SerialBase):
-    """Serial port implementation for plain sockets."""
+    """\
+    Serial port implementation for plain sockets.
+
+    Reading and writing wait with selectors that are set up once when the
+    port is opened (with select() where the selectors module is missing).
+    They also watch a socket pair each, so that cancel_read() and
+    cancel_write() can abort a blocked call.
+    """
 
     BAUDRATES = (50, 75, 110, 134, 150, 200, 300, 600, 1200, 1800, 2400, 4800,
                  9600, 19200, 38400, 57600, 115200)
@@ -64,6 +88,21 @@ class Serial(SerialBase):
             raise SerialException("Could not open port {}: {}".format(self.portstr, msg))
         # after connecting, switch to non-blocking, we're using select
         self._socket.setblocking(False)
+        self._abort_read_r, self._abort_read_w = socket.socketpair()
+        self._abort_write_r, self._abort_write_w = socket.socketpair()
+        for sock in (self._abort_read_r, self._abort_write_r, self._abort_read_w, self._abort_write_w):
+            sock.setblocking(False)
+        if selectors is not None:
+            self._read_selector = selectors.DefaultSelector()
+            self._read_selector.register(self._socket, selectors.EVENT_READ)
+            self._read_selector.register(self._abort_read_r, selectors.EVENT_READ)
+            self._write_selector = selectors.DefaultSelector()
+            self._write_selector.register(self._socket, selectors.EVENT_WRITE)
+            self._write_selector.register(self._abort_write_r, selectors.EVENT_READ)
+        else:
+            # the read and write lists for select()
+            self._read_selector = ([self._socket, self._abort_read_r], [])
+            self._write_selector = ([self._abort_write_r], [self._socket])
 
         # not that there is anything to configure...
         self._reconfigure_port()
@@ -97,6 +136,11 @@ class Serial(SerialBase):
                     # ignore errors.
                     pass
                 self._socket = None
+            if selectors is not None:
+                self._read_selector.close()
+                self._write_selector.close()
+            for sock in (self._abort_read_r, self._abort_read_w, self._abort_write_r, self._abort_write_w):
+                sock.close()
             self.is_open = False
             # in case of quick reconnects, give the server some time
             time.sleep(0.3)
@@ -130,19 +174,51 @@ class Serial(SerialBase):
 
     #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
 
+    def _select(self, selector, timeout):
+        """Return the sockets of selector that are ready"""
+        if selectors is None:
+            rlist, wlist = selector
+            readable, writable, _ = select.select(rlist, wlist, [], timeout)
+            return readable + writable
+        return [key.fileobj for key, events in selector.select(timeout)]
+
+    def _wait(self, selector, abort, timeout):
+        """\
+        Wait for the socket or the abort socket registered with selector, at
+        most timeout seconds (None: no limit). Returns (ready, aborted).
+        """
+        ready = aborted = False
+        for fileobj in self._select(selector, timeout):
+            if fileobj is abort:
+                aborted = True
+                try:
+                    abort.recv(1000)
+                except socket.error as e:
+                    # ignore BlockingIOErrors and EINTR. other errors are shown
+                    if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                        raise
+            else:
+                ready = True
+        return ready, aborted
+
+    def _readable(self):
+        """Return True if data can be received now, without waiting"""
+        return self._socket in self._select(self._read_selector, 0)
+
     @property
     def in_waiting(self):
         """Return the number of bytes currently in the input buffer."""
         if not self.is_open:
             raise portNotOpenError
-        # Poll the socket to see if it is ready for reading.
-        # If ready, at least one byte will be to read.
-        lr, lw, lx = select.select([self._socket], [], [], 0)
-        return len(lr)
+        n = 0
+        if fcntl is not None:
+            n = struct.unpack('I', fcntl.ioctl(self._socket.fileno(), termios.FIONREAD, b'\0\0\0\0'))[0]
+        if not n:
+            # Poll the socket to see if it is ready for reading. If ready, at
+            # least one byte will be to read (or the EOF, which read() reports)
+            n = int(self._readable())
+        return n + len(self._read_ahead)
 
-    # select based implementation, similar to posix, but only using socket API
-    # to be portable, additionally handle socket timeout which is used to
-    # emulate write timeouts
     def read(self, size=1):
         """\
         Read size bytes from the serial port. If a timeout is set it may
@@ -151,23 +227,44 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise portNotOpenError
-        read = bytearray()
-        timeout = Timeout(self._timeout)
-        while len(read) < size:
+        return self._read_growing(size)
+
+    # select based implementation, similar to posix, but only using socket API
+    # to be portable, additionally handle socket timeout which is used to
+    # emulate write timeouts
+    def readinto(self, b):
+        """\
+        Read bytes into a pre-allocated, writable buffer and return the number
+        of bytes read. The data is received directly into the buffer. If a
+        timeout is set it may read less bytes than fit into the buffer.
+        """
+        if not self.is_open:
+            raise portNotOpenError
+        return self._readinto(memoryview(b).cast('B'), Timeout(self._timeout))
+
+    def _readinto(self, buf, timeout):
+        """Read into the byte memoryview buf until it is full or timeout (a Timeout) expires"""
+        size = len(buf)
+        data = self._pop_read_ahead(size)
+        n = len(data)
+        buf[:n] = data
+        while n < size:
             try:
-                ready, _, _ = select.select([self._socket], [], [], timeout.time_left())
+                ready, aborted = self._wait(self._read_selector, self._abort_read_r, timeout.time_left())
+                if aborted:
+                    break   # cancel_read()
                 # If select was used with a timeout, and the timeout occurs, it
                 # returns with empty lists -> thus abort read operation.
                 # For timeout == 0 (non-blocking operation) also abort when
                 # there is nothing to read.
                 if not ready:
                     break   # timeout
-                buf = self._socket.recv(size - len(read))
+                count = self._socket.recv_into(buf[n:])
                 # read should always return some data as select reported it was
                 # ready to read when we get to this point, unless it is EOF
-                if not buf:
+                if not count:
                     raise SerialException('socket disconnected')
-                read.extend(buf)
+                n += count
             except OSError as e:
                 # this is for Python 3.x where select.error is a subclass of
                 # OSError ignore BlockingIOErrors and EINTR. other errors are shown
@@ -182,70 +279,108 @@ class Serial(SerialBase):
                     raise SerialException('read failed: {}'.format(e))
             if timeout.expired():
                 break
-        return bytes(read)
+        return n
 
     def write(self, data):
         """\
         Output the given byte string over the serial port. Can block if the
         connection is blocked. May raise SerialException if the connection is
-        closed.
+        closed. Objects that support the buffer protocol are not copied.
         """
+        return self._write_buffers((data,))
+
+    def write_many(self, buffers):
+        """\
+        Output several buffers as if they were concatenated, with one
+        sendmsg() call where supported. Returns the number of bytes written.
+        """
+        return self._write_buffers(buffers)
+
+    def _write_buffers(self, buffers):
         if not self.is_open:
             raise portNotOpenError
-
-        d = to_bytes(data)
-        tx_len = length = len(d)
+        views = [view for view in (to_buffer(data) for data in buffers) if len(view)]
+        try:
+            return self._write_views(views)
+        finally:
+            # the views of the caller's buffers must not outlive the call, also
+            # not in the traceback of an exception: resizing a bytearray
+            # fails while it is exported
+            for view in views:
+                view.release()
+            del views[:]
+
+    def _write_views(self, views):
+        """Write the list of memoryviews views, it is modified"""
+        written = 0
         timeout = Timeout(self._write_timeout)
-        while tx_len > 0:
+        while views:
             try:
-                n = self._socket.send(d)
-                if timeout.is_non_blocking:
-                    # Zero timeout indicates non-blocking - simply return the
-                    # number of bytes of data actually written
-                    return n
-                elif not timeout.is_infinite:
-                    # when timeout is set, use select to wait for being ready
-                    # with the time left as timeout
-                    if timeout.expired():
-                        raise writeTimeoutError
-                    _, ready, _ = select.select([], [self._socket], [], timeout.time_left())
-                    if not ready:
-                        raise writeTimeoutError
+                if hasattr(self._socket, 'sendmsg'):
+                    n = self._socket.sendmsg(views[:IOV_MAX])
                 else:
-                    assert timeout.time_left() is None
-                    # wait for write operation
-                    _, ready, _ = select.select([], [self._socket], [], None)
-                    if not ready:
-                        raise SerialException('write failed (select)')
-                d = d[n:]
-                tx_len -= n
-            except SerialException:
-                raise
-            except OSError as e:
-                # this is for Python 3.x where select.error is a subclass of
-                # OSError ignore BlockingIOErrors and EINTR. other errors are shown
-                # https://www.python.org/dev/peps/pep-0475.
+                    n = self._socket.send(views[0])
+            except socket.error as e:
+                # ignore BlockingIOErrors and EINTR. other errors are shown
+                # (socket.error is OSError in Python 3.x)
                 if e.errno not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
                     raise SerialException('write failed: {}'.format(e))
-            except select.error as e:
-                # this is for Python 2.x
-                # ignore BlockingIOErrors and EINTR. all errors are shown
-                # see also http://www.python.org/dev/peps/pep-3151/#select
-                if e[0] not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
-                    raise SerialException('write failed: {}'.format(e))
-            if not timeout.is_non_blocking and timeout.expired():
+                n = 0
+            written += n
+            # skip what was sent, partially sent buffers are continued with a
+            # view at the new offset
+            while n:
+                if n >= len(views[0]):
+                    n -= len(views.pop(0))
+                else:
+                    views[0] = views[0][n:]
+                    n = 0
+            if not views:
+                break
+            if timeout.is_non_blocking:
+                # Zero timeout indicates non-blocking - simply return the
+                # number of bytes of data actually written
+                return written
+            if timeout.expired():
+                raise writeTimeoutError
+            # wait until the connection takes more, with the time left as timeout
+            ready, aborted = self._wait(self._write_selector, self._abort_write_r, timeout.time_left())
+            if aborted:
+                break   # cancel_write()
+            if not ready:
                 raise writeTimeoutError
-        return length - len(d)
+        return written
+
+    def cancel_read(self):
+        """Abort a read in progress from another thread"""
+        if self.is_open:
+            try:
+                self._abort_read_w.send(b'x')
+            except socket.error as e:
+                # the socket pair is full if an abort is already pending
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+
+    def cancel_write(self):
+        """Abort a write in progress from another thread"""
+        if self.is_open:
+            try:
+                self._abort_write_w.send(b'x')
+            except socket.error as e:
+                # the socket pair is full if an abort is already pending
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
 
     def reset_input_buffer(self):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise portNotOpenError
+        del self._read_ahead[:]
 
         # just use recv to remove input, while there is some
         ready = True
         while ready:
-            ready, _, _ = select.select([self._socket], [], [], 0)
+            ready = self._readable()
             try:
                 self._socket.recv(4096)
             except OSError as e:
@@ -24,6 +24,7 @@ import sys
 import time
 
 import serial
+from serial.serialutil import SerialBase
 
 try:
     import urlparse
@@ -31,6 +32,14 @@ except ImportError:
     import urllib.parse as urlparse
 
 
+def is_native(name):
+    """\
+    Check if the platform implementation overrides the generic method of
+    SerialBase. The generic ones are based on read(), which logs already.
+    """
+    return getattr(serial.Serial, name) != getattr(SerialBase, name)
+
+
 def sixteen(data):
     """\
     yield tuples of hex and ASCII display in multiples of 16. Includes a
@@ -201,12 +210,31 @@ class Serial(serial.Serial):
         self.formatter.tx(tx)
         return super(Serial, self).write(tx)
 
+    def write_many(self, buffers):
+        buffers = [serial.to_bytes(tx) for tx in buffers]
+        self.formatter.tx(b''.join(buffers))
+        return super(Serial, self).write_many(buffers)
+
     def read(self, size=1):
         rx = super(Serial, self).read(size)
         if rx or self.show_all:
             self.formatter.rx(rx)
         return rx
 
+    if is_native('readinto'):
+        def readinto(self, b):
+            n = super(Serial, self).readinto(b)
+            if n or self.show_all:
+                self.formatter.rx(memoryview(b).cast('B')[:n].tobytes())
+            return n
+
+    if is_native('read_some'):
+        def read_some(self, size=4096, gap=None):
+            rx = super(Serial, self).read_some(size, gap)
+            if rx or self.show_all:
+                self.formatter.rx(rx)
+            return rx
+
     if hasattr(serial.Serial, 'cancel_read'):
         def cancel_read(self):
             self.formatter.control('Q-RX', 'cancel_read')
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#
+# Tests for the pipelined AT command engine
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Test modem.at.ATEngine without a modem: the transport records the written
+commands and the responses are fed to data_received().
+
+Run with 'python -m unittest discover -s tests' in the python directory.
+"""
+import time
+import unittest
+
+from modem.at import ATEngine, ATCommandError, ATTimeout
+
+
+class Transport(object):
+    """Records the data written by the engine"""
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(bytes(data))
+
+
+class Test_ATEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = ATEngine()
+        self.transport = Transport()
+        self.urcs = []
+        self.engine.handle_urc = self.urcs.append
+
+    def test_pipelined(self):
+        """commands are written without waiting, responses assigned in order"""
+        self.engine.connection_made(self.transport)
+        csq = self.engine.submit('AT+CSQ')
+        cpin = self.engine.submit('AT+CPIN?')
+        self.assertEqual(self.transport.written, [b'AT+CSQ\r', b'AT+CPIN?\r'])
+        self.engine.data_received(b'\r\n+CSQ: 20,99\r\n\r\nOK\r\n+CREG: 5\r\n+CPIN: READY\r\n\r\nOK\r\n')
+        self.assertEqual(csq.result(0), ['+CSQ: 20,99'])
+        self.assertEqual(cpin.result(0), ['+CPIN: READY'])
+        self.assertEqual(self.urcs, ['+CREG: 5'])
+
+    def test_error(self):
+        self.engine.connection_made(self.transport)
+        command = self.engine.submit('AT+CGREG=1')
+        self.engine.data_received(b'AT+CGREG=1\r\r\n+CME ERROR: 3\r\n')
+        self.assertRaises(ATCommandError, command.result, 0)
+
+    def test_handler_raises(self):
+        """the lines behind one whose handler raised are not lost"""
+        def handle_urc(line):
+            if line == '+BAD: 1':
+                raise ValueError(line)
+            self.urcs.append(line)
+        self.engine.handle_urc = handle_urc
+        self.assertRaises(ValueError, self.engine.data_received, b'+BAD: 1\r\n+CREG: 1\r\n+CRE')
+        self.engine.data_received(b'G: 5\r\n')
+        self.assertEqual(self.urcs, ['+CREG: 1', '+CREG: 5'])
+
+
+class Test_DataCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = ATEngine()
+        self.transport = Transport()
+        self.urcs = []
+        self.engine.handle_urc = self.urcs.append
+        self.engine.connection_made(self.transport)
+
+    def test_prompt_line_and_echo(self):
+        """the echo of the payload behind the prompt line is not split into lines"""
+        command = self.engine.send_data('AT+TCPSEND=1,5', b'hel\r\n')
+        self.engine.data_received(b'AT+TCPSEND=1,5\r\r\n> \r\nhel\r\n\r\nOK\r\n\r\n+TCPSEND: 1,5\r\n')
+        self.assertEqual(self.transport.written, [b'AT+TCPSEND=1,5\r', b'hel\r\n'])
+        self.assertEqual(command.result(0), [])
+        self.assertEqual(self.urcs, ['+TCPSEND: 1,5'])
+
+    def test_prompt_without_line_end(self):
+        command = self.engine.send_data('AT+TCPSEND=1,3', b'abc')
+        self.engine.data_received(b'AT+TCPSEND=1,3\r\r\n> ')
+        self.assertEqual(self.transport.written, [b'AT+TCPSEND=1,3\r', b'abc'])
+        self.engine.data_received(b'abc\r\nOK\r\n')
+        self.assertEqual(command.result(0), [])
+
+    def test_commands_wait_for_the_payload(self):
+        data = self.engine.send_data('AT+TCPSEND=1,3', b'abc')
+        csq = self.engine.submit('AT+CSQ')
+        self.assertEqual(self.transport.written, [b'AT+TCPSEND=1,3\r'])
+        self.engine.data_received(b'\r\n> ')
+        self.assertEqual(self.transport.written, [b'AT+TCPSEND=1,3\r', b'abc', b'AT+CSQ\r'])
+        self.engine.data_received(b'\r\nOK\r\n\r\n+CSQ: 20,99\r\n\r\nOK\r\n')
+        self.assertEqual(data.result(0), [])
+        self.assertEqual(csq.result(0), ['+CSQ: 20,99'])
+
+
+class Test_Timeouts(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = Transport()
+
+    def assertTimeout(self, engine, command, seconds):
+        """wait() raises ATTimeout after about the given time, without spinning"""
+        start = time.time()
+        cpu = time.process_time()
+        self.assertRaises(ATTimeout, engine.wait, command)
+        self.assertAlmostEqual(time.time() - start, seconds, delta=0.15)
+        self.assertLess(time.process_time() - cpu, 0.1)
+
+    def test_own_deadline(self):
+        """each in-flight command times out by its own deadline"""
+        engine = ATEngine()
+        engine.connection_made(self.transport)
+        slow = engine.submit('AT+COPS=?', timeout=5)
+        fast = engine.submit('AT+CSQ', timeout=0.1)
+        self.assertTimeout(engine, fast, 0.1)
+        self.assertFalse(slow.done())
+        engine.data_received(b'\r\nOK\r\n')
+        self.assertEqual(slow.result(0), [])
+
+    def test_late_response(self):
+        """the response of an expired command goes to the following one"""
+        engine = ATEngine()
+        engine.connection_made(self.transport)
+        first = engine.submit('AT+CSQ', timeout=0.1)
+        self.assertTimeout(engine, first, 0.1)
+        second = engine.submit('AT')
+        engine.data_received(b'\r\nOK\r\n')
+        self.assertEqual(second.result(0), [])
+
+    def test_queued_unconnected(self):
+        """commands queued before the port is connected expire too"""
+        engine = ATEngine()
+        command = engine.submit('AT', timeout=0.1)
+        self.assertTimeout(engine, command, 0.1)
+        engine.connection_made(self.transport)
+        self.assertEqual(self.transport.written, [])
+
+    def test_queued_behind_slow_command(self):
+        """a command that is not sent expires without a hot loop in wait()"""
+        engine = ATEngine(max_in_flight=1)
+        slow = engine.submit('AT+COPS=?', timeout=5)
+        queued = engine.submit('AT+CSQ', timeout=0.2)
+        engine.connection_made(self.transport)
+        self.assertTimeout(engine, queued, 0.2)
+        engine.data_received(b'\r\nOK\r\n')
+        self.assertEqual(slow.result(0), [])
+        self.assertEqual(self.transport.written, [b'AT+COPS=?\r'])
+
+    def test_timeout_starts_when_sent(self):
+        """a command queued on a connected port has its full timeout once sent"""
+        engine = ATEngine(max_in_flight=1)
+        engine.connection_made(self.transport)
+        engine.submit('AT+COPS=?', timeout=0.2)
+        queued = engine.submit('AT+CSQ', timeout=0.2)
+        self.assertTimeout(engine, queued, 0.4)
+        self.assertEqual(self.transport.written, [b'AT+COPS=?\r', b'AT+CSQ\r'])
+
+    def test_connection_lost(self):
+        engine = ATEngine()
+        engine.connection_made(self.transport)
+        command = engine.submit('AT')
+        engine.connection_lost(None)
+        self.assertRaises(Exception, command.result, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#
+# Tests for the bulk read functions, on loop://
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Test readinto(), read() and read_until() with the loop:// handler: the data
+written to the port is read back.
+
+Run with 'python -m unittest discover -s tests' in the python directory.
+"""
+import array
+import time
+import unittest
+
+import serial
+
+
+class Test_readinto(unittest.TestCase):
+
+    def setUp(self):
+        self.s = serial.serial_for_url('loop://', timeout=0.1)
+
+    def tearDown(self):
+        self.s.close()
+
+    def test_bytearray(self):
+        self.s.write(b'hello world')
+        b = bytearray(5)
+        self.assertEqual(self.s.readinto(b), 5)
+        self.assertEqual(b, b'hello')
+        self.assertEqual(self.s.read(100), b' world')
+
+    def test_memoryview_slice(self):
+        self.s.write(b'abc')
+        b = bytearray(b'------')
+        self.assertEqual(self.s.readinto(memoryview(b)[2:5]), 3)
+        self.assertEqual(b, b'--abc-')
+
+    def test_array(self):
+        """buffers with items of more than one byte are filled bytewise"""
+        self.s.write(b'\x01\x00\x02\x00')
+        a = array.array('H', [0, 0])
+        self.assertEqual(self.s.readinto(a), 4)
+        self.assertEqual(a.tobytes(), b'\x01\x00\x02\x00')
+
+    def test_timeout(self):
+        """with less data than space, readinto() returns after the timeout"""
+        self.s.write(b'abc')
+        b = bytearray(10)
+        start = time.time()
+        self.assertEqual(self.s.readinto(b), 3)
+        self.assertAlmostEqual(time.time() - start, 0.1, delta=0.08)
+        self.assertEqual(b[:3], b'abc')
+
+    def test_read_large_size(self):
+        """read() does not allocate the size, the result grows with the data"""
+        self.s.write(b'abc')
+        self.assertEqual(self.s.read(10 ** 9), b'abc')
+        self.s.write(b'x' * 4000)
+        self.assertEqual(self.s.read(6000), b'x' * 4000)
+
+    def test_non_blocking(self):
+        self.s.timeout = 0
+        self.assertEqual(self.s.readinto(bytearray(10)), 0)
+
+    def test_closed(self):
+        self.s.close()
+        self.assertRaises(serial.SerialException, self.s.readinto, bytearray(1))
+
+
+
+class Test_read_until(unittest.TestCase):
+
+    def setUp(self):
+        self.s = serial.serial_for_url('loop://', timeout=0.1)
+
+    def tearDown(self):
+        self.s.close()
+
+    def test_rest_is_kept(self):
+        """the data behind the terminator is returned by the next reads"""
+        self.s.write(b'one\ntwo\nthree')
+        self.assertEqual(self.s.read_until(), b'one\n')
+        self.assertEqual(self.s.in_waiting, 9)
+        self.assertEqual(self.s.read_until(), b'two\n')
+        b = bytearray(2)
+        self.assertEqual(self.s.readinto(b), 2)
+        self.assertEqual(b, b'th')
+        self.assertEqual(self.s.read(10), b'ree')
+
+    def test_terminator_split(self):
+        """a terminator of more than one byte may arrive in parts"""
+        self.s.write(b'abc\r')
+        self.assertEqual(self.s.read_until(b'\r\n', size=4), b'abc\r')
+        self.s.write(b'def\r')
+        self.s.write(b'\nghi')
+        self.assertEqual(self.s.read_until(b'\r\n'), b'def\r\n')
+        self.assertEqual(self.s.read(3), b'ghi')
+
+    def test_size(self):
+        self.s.write(b'abcdef\n')
+        self.assertEqual(self.s.read_until(size=4), b'abcd')
+        self.assertEqual(self.s.read_until(size=4), b'ef\n')
+
+    def test_terminator_behind_size(self):
+        """a terminator that does not fit into size is not found"""
+        self.s.write(b'abc\r\n')
+        self.assertEqual(self.s.read_until(b'\r\n', size=4), b'abc\r')
+        self.assertEqual(self.s.read_until(b'\r\n'), b'\n')
+
+    def test_timeout(self):
+        self.s.write(b'abc')
+        start = time.time()
+        self.assertEqual(self.s.read_until(), b'abc')
+        self.assertAlmostEqual(time.time() - start, 0.1, delta=0.08)
+
+    def test_read_raises(self):
+        """the data read before the error is returned by the next read"""
+        self.s.write(b'abc')
+        self.assertEqual(self.s.read_until(size=1), b'a')
+        read = self.s.read
+        calls = []
+
+        def failing_read(size=1):
+            calls.append(size)
+            if len(calls) == 2:
+                raise serial.SerialException('read failed')
+            return read(size)
+        self.s.read = failing_read
+        self.s.write(b'def')
+        self.assertRaises(serial.SerialException, self.s.read_until)
+        del self.s.read
+        self.s.write(b'\n')
+        self.assertEqual(self.s.read_until(), b'bcdef\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+# Tests for the RFC 2217 telnet stream handling
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Test the escaping and filtering of the telnet stream by the PortManager of
+serial.rfc2217, with any split of the input, and the round trip from the
+rfc2217:// client through the Server to a pseudo terminal.
+
+Run with 'python -m unittest discover -s tests' in the python directory.
+"""
+import os
+import random
+import select
+import struct
+import threading
+import time
+import unittest
+
+try:
+    import pty
+    import tty
+except ImportError:
+    pty = None
+
+import serial
+from serial import rfc2217
+from serial.rfc2217 import IAC, SB, SE, COM_PORT_OPTION, SET_BAUDRATE, SERVER_SET_BAUDRATE
+
+
+class Connection(object):
+    """Records the data the PortManager sends to the client"""
+
+    def __init__(self):
+        self.written = bytearray()
+
+    def write(self, data):
+        self.written += data
+
+
+def subnegotiation(option, value):
+    return IAC + SB + COM_PORT_OPTION + option + value.replace(IAC, IAC + IAC) + IAC + SE
+
+
+class Test_PortManager(unittest.TestCase):
+
+    def setUp(self):
+        self.serial = serial.serial_for_url('loop://', baudrate=115200)
+        self.connection = Connection()
+        self.manager = rfc2217.PortManager(self.serial, self.connection)
+        del self.connection.written[:]  # the initial option requests
+
+    def tearDown(self):
+        self.serial.close()
+
+    def test_escape(self):
+        self.assertEqual(b''.join(self.manager.escape(b'\xffa\xff\xff')), b'\xff\xffa\xff\xff\xff\xff')
+        self.assertEqual(b''.join(self.manager.escape(b'abc')), b'abc')
+
+    def test_filter(self):
+        """data runs are passed as a whole, doubled IACs as one byte"""
+        self.assertEqual(list(self.manager.filter(b'abc\xff\xffdef')), [b'abc', b'\xff', b'def'])
+
+    def test_split_anywhere(self):
+        """the result does not depend on how the stream is split"""
+        rng = random.Random(9)
+        payload = bytes(bytearray(range(256))) * 2
+        # 9600 baud, the value contains no IAC but the next one does
+        stream = (b''.join(self.manager.escape(payload[:300])) +
+                  subnegotiation(SET_BAUDRATE, struct.pack(b'!I', 9600)) +
+                  b''.join(self.manager.escape(payload[300:])) +
+                  subnegotiation(SET_BAUDRATE, struct.pack(b'!I', 0xff00)))
+        for _ in range(50):
+            pos = 0
+            received = bytearray()
+            while pos < len(stream):
+                n = rng.randint(1, 20)
+                for chunk in self.manager.filter(stream[pos:pos + n]):
+                    received += chunk
+                pos += n
+            self.assertEqual(received, payload)
+            self.assertEqual(self.serial.baudrate, 0xff00)
+        # every SET_BAUDRATE is answered with the new value
+        answers = self.connection.written.split(IAC + SE)
+        self.assertEqual(answers[-2], (IAC + SB + COM_PORT_OPTION + SERVER_SET_BAUDRATE +
+                                       struct.pack(b'!I', 0xff00).replace(IAC, IAC + IAC)))
+
+
+class PseudoTerminal(serial.Serial):
+    """A pty has no modem lines, they are simulated"""
+
+    lines = serial.ModemStatus(False, False, False, False)
+
+    @property
+    def modem_status(self):
+        return self.lines
+
+    def _update_dtr_state(self):
+        pass
+
+    def _update_rts_state(self):
+        pass
+
+
+@unittest.skipIf(pty is None, 'needs a pseudo terminal')
+class Test_RoundTrip(unittest.TestCase):
+    """rfc2217:// client and Server, the served port is a pseudo terminal"""
+
+    def setUp(self):
+        self.master, slave = pty.openpty()
+        self.addCleanup(os.close, self.master)
+        tty.setraw(self.master)
+        tty.setraw(slave)
+        self.served = PseudoTerminal(os.ttyname(slave), baudrate=115200)
+        os.close(slave)
+        self.addCleanup(self.served.close)
+        server = rfc2217.Server(poll_interval=0.05)
+        port = server.add_port(self.served, ('127.0.0.1', 0))
+        thread = threading.Thread(target=server.run)
+        thread.start()
+        self.addCleanup(server.close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.stop)
+        self.client = serial.serial_for_url(
+            'rfc2217://127.0.0.1:{}'.format(port.listen_socket.getsockname()[1]), baudrate=115200, timeout=1)
+        self.addCleanup(self.client.close)
+
+    def read_master(self, size):
+        data = bytearray()
+        while len(data) < size and select.select([self.master], [], [], 1)[0]:
+            data += os.read(self.master, size - len(data))
+        return bytes(data)
+
+    def test_to_serial(self):
+        """all byte values, IAC included, arrive unchanged"""
+        payload = bytes(bytearray(range(256))) * 8
+        self.client.write(payload)
+        self.assertEqual(self.read_master(len(payload)), payload)
+
+    def test_from_serial(self):
+        payload = bytes(bytearray(range(256))) * 8
+        for pos in range(0, len(payload), 100):
+            os.write(self.master, payload[pos:pos + 100])
+        self.assertEqual(self.client.read(len(payload)), payload)
+        self.assertEqual(self.client.read_until(size=1), b'')
+
+    def test_settings(self):
+        """port settings are applied to the served port"""
+        self.client.baudrate = 9600
+        self.assertEqual(self.served.baudrate, 9600)
+        # (a pty does not accept all settings, e.g. no parity)
+        self.client.stopbits = serial.STOPBITS_TWO
+        self.assertEqual(self.served.stopbits, serial.STOPBITS_TWO)
+
+    def test_modem_lines(self):
+        """the modem lines are polled and changes are sent to the client"""
+        self.assertFalse(self.client.cts)
+        self.served.lines = serial.ModemStatus(True, False, False, True)
+        time.sleep(0.3)
+        self.assertTrue(self.client.cts)
+        self.assertFalse(self.client.dsr)
+        self.assertTrue(self.client.cd)
+
+
+if __name__ == '__main__':
+    unittest.main()
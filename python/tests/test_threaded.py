@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+# Tests for the packet parsers of serial.threaded
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Test the Packetizer and FramedPacket protocols of serial.threaded: the
+packets must not depend on how the data is split into data_received()
+calls. The expected results are those of the byte by byte parsers of
+pySerial 3.4.
+
+Run with 'python -m unittest discover -s tests' in the python directory.
+"""
+import random
+import unittest
+
+import serial.threaded
+
+
+def chunks(data, rng):
+    """Split data at random positions, including empty chunks"""
+    pos = 0
+    while pos < len(data):
+        n = rng.randint(0, 7)
+        yield data[pos:pos + n]
+        pos += n
+
+
+class Packets(serial.threaded.Packetizer):
+    TERMINATOR = b'\r\n'
+
+    def __init__(self):
+        super(Packets, self).__init__()
+        self.packets = []
+
+    def handle_packet(self, packet):
+        self.packets.append(bytes(packet))
+
+
+class Frames(serial.threaded.FramedPacket):
+
+    def __init__(self):
+        super(Frames, self).__init__()
+        self.packets = []
+        self.outside = bytearray()
+
+    def handle_packet(self, packet):
+        self.packets.append(packet)
+
+    def handle_out_of_packet_data(self, data):
+        self.outside.extend(data)
+
+
+def packetize(data, terminator):
+    """pySerial 3.4 Packetizer.data_received(), in one call"""
+    buffer = bytearray(data)
+    packets = []
+    while terminator in buffer:
+        packet, buffer = buffer.split(terminator, 1)
+        packets.append(bytes(packet))
+    return packets, bytes(buffer)
+
+
+def frame(data, start=b'(', stop=b')'):
+    """pySerial 3.4 FramedPacket.data_received(), in one call"""
+    packets = []
+    packet = bytearray()
+    outside = bytearray()
+    in_packet = False
+    for byte in serial.iterbytes(data):
+        if byte == start:
+            in_packet = True
+        elif byte == stop:
+            in_packet = False
+            packets.append(bytes(packet))
+            del packet[:]
+        elif in_packet:
+            packet.extend(byte)
+        else:
+            outside.extend(byte)
+    return packets, bytes(outside), in_packet, bytes(packet)
+
+
+class Test_Packetizer(unittest.TestCase):
+    """Packetizer with a two byte terminator"""
+
+    def test_one_call(self):
+        p = Packets()
+        p.data_received(b'OK\r\n\r\n+CSQ: 20,99\r\nrest')
+        self.assertEqual(p.packets, [b'OK', b'', b'+CSQ: 20,99'])
+        self.assertEqual(p.buffer, b'rest')
+
+    def test_terminator_split(self):
+        """the first byte of the terminator ends one call"""
+        p = Packets()
+        p.data_received(b'OK\r')
+        self.assertEqual(p.packets, [])
+        p.data_received(b'\nERROR\r')
+        p.data_received(b'\r\n')
+        self.assertEqual(p.packets, [b'OK', b'ERROR\r'])
+        self.assertEqual(p.buffer, b'')
+
+    def test_split_anywhere(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            data = bytes(bytearray(rng.choice(b'ab\r\n') for _ in range(rng.randint(0, 60))))
+            p = Packets()
+            for chunk in chunks(data, rng):
+                p.data_received(chunk)
+            self.assertEqual((p.packets, bytes(p.buffer)), packetize(data, Packets.TERMINATOR), data)
+
+    def test_handle_packet_raises(self):
+        """the packets that were handled are removed from the buffer"""
+        class Failing(Packets):
+            def handle_packet(self, packet):
+                if packet == b'bad':
+                    raise ValueError(packet)
+                super(Failing, self).handle_packet(packet)
+        p = Failing()
+        self.assertRaises(ValueError, p.data_received, b'a\r\nbad\r\nb\r\nc')
+        self.assertEqual(p.packets, [b'a'])
+        self.assertEqual(p.buffer, b'b\r\nc')
+        p.data_received(b'\r\n')
+        self.assertEqual(p.packets, [b'a', b'b', b'c'])
+
+
+class Test_FramedPacket(unittest.TestCase):
+    """FramedPacket with the default markers"""
+
+    def test_one_call(self):
+        p = Frames()
+        p.data_received(b'x(abc)y()z(de')
+        self.assertEqual(p.packets, [b'abc', b''])
+        self.assertEqual(p.outside, b'xyz')
+        self.assertTrue(p.in_packet)
+        self.assertEqual(p.packet, b'de')
+
+    def test_nested_and_unmatched_markers(self):
+        """a START restarts nothing, a STOP outside a packet ends an empty one"""
+        p = Frames()
+        p.data_received(b'(a(b)c)')
+        self.assertEqual(p.packets, [b'ab', b''])
+        self.assertEqual(p.outside, b'c')
+        self.assertFalse(p.in_packet)
+
+    def test_split_anywhere(self):
+        rng = random.Random(6)
+        for _ in range(200):
+            data = bytes(bytearray(rng.choice(b'ab()') for _ in range(rng.randint(0, 60))))
+            p = Frames()
+            for chunk in chunks(data, rng):
+                p.data_received(chunk)
+            self.assertEqual((p.packets, bytes(p.outside), p.in_packet, bytes(p.packet)), frame(data), data)
+
+    def test_connection_lost(self):
+        """an incomplete packet is dropped"""
+        p = Frames()
+        p.connection_made(None)
+        p.data_received(b'(abc')
+        p.connection_lost(None)
+        p.data_received(b'd)')
+        self.assertEqual(p.packets, [b''])
+        self.assertEqual(p.outside, b'd')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Tests for the response line parsers and the URC registry
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Test the parsers of modem.urc and the dispatch of URCs.
+
+Run with 'python -m unittest discover -s tests' in the python directory.
+"""
+import unittest
+
+from modem.urc import URCRegistry, Registration, CSQ, TCPRecv, split_line
+
+
+class Test_Parsers(unittest.TestCase):
+
+    def setUp(self):
+        self.urc = URCRegistry()
+
+    def test_split_line(self):
+        self.assertEqual(split_line('+CSQ: 20,99'), ('+CSQ', '20,99'))
+        self.assertEqual(split_line('RING'), ('RING', None))
+
+    def test_fields(self):
+        self.assertEqual(self.urc.parse('+CSQ: 20,99'), ('+CSQ', CSQ(20, 99)))
+        self.assertEqual(self.urc.parse('+CPIN: READY'), ('+CPIN', 'READY'))
+        self.assertEqual(self.urc.parse('+CGATT: 1'), ('+CGATT', 1))
+        # the last field keeps its commas
+        self.assertEqual(self.urc.parse('+TCPRECV: 1,5,a,b,c'), ('+TCPRECV', TCPRecv(1, 5, 'a,b,c')))
+
+    def test_unknown_token(self):
+        self.assertEqual(self.urc.parse('+XYZ:  a,b '), ('+XYZ', 'a,b '))
+
+    def test_registration_read(self):
+        """the read command response starts with the mode <n>"""
+        self.assertEqual(self.urc.parse('+CREG: 0,1')[1], Registration(1, None, None, None))
+        self.assertEqual(self.urc.parse('+CGREG: 2,5,"1A2B","01C3"')[1], Registration(5, 0x1a2b, 0x1c3, None))
+        self.assertEqual(self.urc.parse('+CEREG: 2,1,"1A2B","01C3",7')[1], Registration(1, 0x1a2b, 0x1c3, 7))
+
+    def test_registration_urc(self):
+        self.assertEqual(self.urc.parse('+CREG: 1')[1], Registration(1, None, None, None))
+        self.assertEqual(self.urc.parse('+CGREG: 5,"1A2B","01C3"')[1], Registration(5, 0x1a2b, 0x1c3, None))
+        self.assertEqual(self.urc.parse('+CEREG: 1, "1A2B", "01C3", 7')[1], Registration(1, 0x1a2b, 0x1c3, 7))
+
+    def test_register_parser(self):
+        """parsers of the instance take precedence"""
+        self.urc.register_parser('+CSQ', int)
+        self.assertRaises(ValueError, self.urc.parse, '+CSQ: 20,99')
+        self.assertEqual(URCRegistry().parse('+CSQ: 20,99')[1], CSQ(20, 99))
+
+
+class Test_Dispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.urc = URCRegistry()
+        self.received = []
+        self.urc.subscribe('+CREG', lambda token, value: self.received.append((token, value)))
+
+    def test_dispatch(self):
+        self.assertTrue(self.urc.dispatch('+CREG: 1,"1A2B","01C3",7'))
+        self.assertEqual(self.received, [('+CREG', Registration(1, 0x1a2b, 0x1c3, 7))])
+        self.assertFalse(self.urc.dispatch('+CGREG: 1'))
+
+    def test_unparsable(self):
+        """handled (and logged), but not passed to the subscribers"""
+        with self.assertLogs('modem.urc', 'WARNING'):
+            self.assertTrue(self.urc.dispatch('+CREG: x'))
+        self.assertEqual(self.received, [])
+
+    def test_failing_subscriber(self):
+        """one failing subscriber does not stop the others"""
+        def fail(token, value):
+            raise RuntimeError('subscriber')
+        self.urc.subscribe('+CREG', fail)
+        self.urc.subscribe('+CREG', lambda token, value: self.received.append('second'))
+        with self.assertLogs('modem.urc', 'ERROR'):
+            self.assertTrue(self.urc.dispatch('+CREG: 1'))
+        self.assertEqual(self.received, [('+CREG', Registration(1, None, None, None)), 'second'])
+
+    def test_unsubscribe(self):
+        callback = self.received.append
+        self.urc.subscribe('+CGREG', callback)
+        self.urc.unsubscribe('+CGREG', callback)
+        self.assertFalse(self.urc.dispatch('+CGREG: 1'))
+
+
+if __name__ == '__main__':
+    unittest.main()